@@ -0,0 +1,139 @@
+"""
+Attendance statistics computed in SQL.
+
+Rates and monthly rollups are read from attendance_summary, a per student,
+subject and month table of status counts that triggers keep current on
+every insert, update and delete (see migrations.py). Only date ranges that
+do not fall on month boundaries, and streaks, touch the raw attendance
+rows. Streaks are opt-in: they need two window functions over every
+matching raw row, which dominates the cost of an unfiltered call on a
+large table. A record counts as attended when its status is present or late.
+"""
+
+import re
+
+# Matches YYYY-MM-01, the only bounds the monthly summary can answer
+MONTH_START = re.compile(r'^\d{4}-\d{2}-01$')
+
+# Grouped sections of the stats response: name -> grouping column
+GROUPS = {'students': 'student_name', 'subjects': 'subject', 'monthly': 'month'}
+
+_COUNTS = """
+    SUM(present) AS present, SUM(absent) AS absent, SUM(late) AS late, SUM(total) AS total
+"""
+
+_RAW_SOURCE = """(
+    SELECT student_name, subject, substr(date, 1, 7) AS month,
+           SUM(lower(status) = 'present') AS present, SUM(lower(status) = 'absent') AS absent,
+           SUM(lower(status) = 'late') AS late, COUNT(*) AS total
+    FROM attendance {where}
+    GROUP BY student_name, subject, substr(date, 1, 7)
+)"""
+
+
+def _row_filters(student, subject, date_from, date_to):
+    where, params = [], []
+    if student:
+        where.append('student_name = ?')
+        params.append(student)
+    if subject:
+        where.append('subject = ?')
+        params.append(subject)
+    if date_from:
+        where.append('date >= ?')
+        params.append(date_from)
+    if date_to:
+        where.append('date < ?')
+        params.append(date_to)
+    return where, params
+
+
+def _source(student, subject, date_from, date_to):
+    """Return (FROM clause, params) for the cheapest table that can answer."""
+    if all(bound is None or MONTH_START.match(bound) for bound in (date_from, date_to)):
+        where, params = _row_filters(student, subject, None, None)
+        if date_from:
+            where.append('month >= ?')
+            params.append(date_from[:7])
+        if date_to:
+            where.append('month < ?')
+            params.append(date_to[:7])
+        sql = 'attendance_summary'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        return sql, params
+    where, params = _row_filters(student, subject, date_from, date_to)
+    clause = 'WHERE ' + ' AND '.join(where) if where else ''
+    return _RAW_SOURCE.format(where=clause), params
+
+
+def _with_rates(row):
+    stats = dict(row)
+    for key in ('present', 'absent', 'late', 'total'):
+        stats[key] = stats[key] or 0
+    total = stats['total']
+    stats['rate'] = round((stats['present'] + stats['late']) / total, 4) if total else 0.0
+    return stats
+
+
+def streaks(db, student=None, subject=None, date_from=None, date_to=None):
+    """Current and longest run of attended records per student.
+
+    Uses gaps-and-islands over the (student_name, date, id) index: within a
+    student, consecutive records with the same attended flag share the
+    same difference between their overall and per-flag row numbers.
+    """
+    where, params = _row_filters(student, subject, date_from, date_to)
+    clause = 'WHERE ' + ' AND '.join(where) if where else ''
+    rows = db.execute(f"""
+        WITH ordered AS (
+            SELECT student_name, lower(status) IN ('present', 'late') AS attended,
+                   ROW_NUMBER() OVER (PARTITION BY student_name ORDER BY date, id) AS position,
+                   ROW_NUMBER() OVER (PARTITION BY student_name, lower(status) IN ('present', 'late')
+                                      ORDER BY date, id) AS run_position
+            FROM attendance {clause}
+        ),
+        runs AS (
+            SELECT student_name, attended, COUNT(*) AS length, MAX(position) AS last_position
+            FROM ordered
+            GROUP BY student_name, attended, position - run_position
+        ),
+        ranked AS (
+            SELECT *, MAX(last_position) OVER (PARTITION BY student_name) AS records FROM runs
+        )
+        SELECT student_name,
+               MAX(CASE WHEN attended AND last_position = records THEN length ELSE 0 END) AS current_streak,
+               MAX(CASE WHEN attended THEN length ELSE 0 END) AS longest_streak
+        FROM ranked
+        GROUP BY student_name
+    """, params)
+    return {
+        row['student_name']: {'current_streak': row['current_streak'],
+                              'longest_streak': row['longest_streak']}
+        for row in rows
+    }
+
+
+def stats(db, student=None, subject=None, date_from=None, date_to=None, include_streaks=False):
+    """Overall, per-student, per-subject and per-month attendance counts and rates.
+
+    date_to is exclusive. Month-aligned ranges are answered from
+    attendance_summary alone. include_streaks adds current and longest
+    streaks to each student, computed from the raw rows.
+    """
+    source, params = _source(student, subject, date_from, date_to)
+    overall = db.execute(f'SELECT {_COUNTS} FROM {source}', params).fetchone()
+    result = {'overall': _with_rates(overall)}
+    for name, column in GROUPS.items():
+        rows = db.execute(
+            f'SELECT {column}, {_COUNTS} FROM {source} GROUP BY {column} ORDER BY {column}',
+            params
+        )
+        result[name] = [_with_rates(row) for row in rows]
+
+    if not include_streaks:
+        return result
+    runs = streaks(db, student, subject, date_from, date_to)
+    for entry in result['students']:
+        entry.update(runs.get(entry['student_name'], {'current_streak': 0, 'longest_streak': 0}))
+    return result
@@ -0,0 +1 @@
+"""Benchmarks and load tests; see README.md (Benchmarks)."""
@@ -0,0 +1,118 @@
+"""
+Shared helpers for the benchmark suite: timing, result files and fixtures.
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.getenv('BENCH_RESULTS_DIR', os.path.join(ROOT, 'benchmarks', 'results'))
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(name, durations, **params):
+    """Turn a list of durations in seconds into a result record (milliseconds)."""
+    values = sorted(d * 1000 for d in durations)
+    return {
+        'name': name,
+        'params': params,
+        'n': len(values),
+        'mean_ms': round(statistics.fmean(values), 4) if values else 0.0,
+        'p50_ms': round(percentile(values, 0.5), 4),
+        'p95_ms': round(percentile(values, 0.95), 4),
+        'p99_ms': round(percentile(values, 0.99), 4),
+        'min_ms': round(values[0], 4) if values else 0.0,
+        'max_ms': round(values[-1], 4) if values else 0.0,
+    }
+
+
+def measure(name, function, repeat, warmup=1, **params):
+    """Call function() warmup + repeat times and summarize the timed calls."""
+    for _ in range(warmup):
+        function()
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - started)
+    result = summarize(name, durations, **params)
+    print(f"{name:<40} {json.dumps(params):<32} mean {result['mean_ms']:>10.3f} ms"
+          f"  p95 {result['p95_ms']:>10.3f} ms")
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def write_results(suite, results, path=None):
+    """Write results to benchmarks/results/<suite>-<commit>-<time>.json and return the path."""
+    commit = git_commit()
+    payload = {
+        'suite': suite,
+        'commit': commit,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{suite}-{commit}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    print(f'Results written to {path}')
+    return path
+
+
+def make_pdf(pages, words_per_page=200):
+    """Build a plain-text multi-page PDF without any PDF library."""
+    objects = {
+        1: '<< /Type /Catalog /Pages 2 0 R >>',
+        3: '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    }
+    kids = []
+    number = 4
+    for page in range(pages):
+        text = ' '.join(f'page{page}word{word}' for word in range(words_per_page))
+        lines = [text[i:i + 80] for i in range(0, len(text), 80)]
+        stream = 'BT /F1 10 Tf 20 800 Td 12 TL ' + ' '.join(f'({line}) Tj T*' for line in lines) + ' ET'
+        objects[number] = (f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] '
+                           f'/Resources << /Font << /F1 3 0 R >> >> /Contents {number + 1} 0 R >>')
+        objects[number + 1] = f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream'
+        kids.append(f'{number} 0 R')
+        number += 2
+    objects[2] = f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(kids)} >>'
+
+    body = b'%PDF-1.4\n'
+    offsets = {}
+    for key in sorted(objects):
+        offsets[key] = len(body)
+        body += f'{key} 0 obj\n{objects[key]}\nendobj\n'.encode()
+    xref = len(body)
+    body += f'xref\n0 {number}\n0000000000 65535 f \n'.encode()
+    for key in range(1, number):
+        body += f'{offsets[key]:010d} 00000 n \n'.encode()
+    body += f'trailer\n<< /Size {number} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode()
+    return body
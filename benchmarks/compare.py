@@ -0,0 +1,64 @@
+"""
+Compare two benchmark result files, e.g. before and after a change.
+
+    python -m benchmarks.compare benchmarks/results/micro-abc123-....json \\
+                                 benchmarks/results/micro-def456-....json
+
+Results are matched by name and parameters. The ratio is new / old for the
+chosen statistic, so values above 1 are slower. Exits with status 1 when
+any benchmark got slower than --threshold, which makes it usable in CI.
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        payload = json.load(f)
+    results = {}
+    for result in payload['results']:
+        key = (result['name'], json.dumps(result['params'], sort_keys=True))
+        results[key] = result
+    return payload, results
+
+
+def compare(old, new, stat='p50_ms', threshold=1.10):
+    """Return rows of (name, params, old value, new value, ratio, regressed)."""
+    rows = []
+    for key, result in new.items():
+        if key not in old:
+            continue
+        before, after = old[key][stat], result[stat]
+        ratio = after / before if before else float('inf') if after else 1.0
+        rows.append((key[0], key[1], before, after, ratio, ratio > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--stat', default='p50_ms',
+                        choices=['mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'min_ms', 'max_ms'])
+    parser.add_argument('--threshold', type=float, default=1.10,
+                        help='flag results slower than old * threshold (default 1.10)')
+    args = parser.parse_args()
+
+    old_payload, old = load(args.old)
+    new_payload, new = load(args.new)
+    print(f"{old_payload['suite']}: {old_payload['commit']} -> {new_payload['commit']} ({args.stat})")
+    rows = compare(old, new, args.stat, args.threshold)
+    for name, params, before, after, ratio, regressed in rows:
+        marker = '  REGRESSION' if regressed else ''
+        print(f'{name:<40} {params:<36} {before:>10.3f} -> {after:>10.3f} ms  x{ratio:.2f}{marker}')
+
+    missing = sorted(set(old) - set(new))
+    for name, params in missing:
+        print(f'{name:<40} {params:<36} missing from new results')
+    sys.exit(1 if any(row[-1] for row in rows) else 0)
+
+
+if __name__ == '__main__':
+    main()
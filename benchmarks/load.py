@@ -0,0 +1,199 @@
+"""
+Load scenarios against the Flask app with stubbed upstream services.
+
+    python -m benchmarks.load                              # all scenarios
+    python -m benchmarks.load --scenario chat --scenario news --latency 0.3
+    python -m benchmarks.load --concurrency 32 --requests 500 --cold
+
+Groq, GNews and OpenWeather are replaced by local stubs (benchmarks/stubs.py)
+that add --latency seconds to every response, so results do not depend on
+the network or on API quotas. The app runs in a threaded WSGI server on a
+throwaway database seeded with --rows flashcards, tasks and attendance rows.
+--cold disables the news/weather cache so every request reaches a stub.
+
+Per scenario the run records throughput, latency percentiles, error count
+and how many requests reached each stub, and writes them as JSON to
+benchmarks/results/ (see compare.py).
+"""
+
+import argparse
+import itertools
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.common import summarize, write_results
+from benchmarks.stubs import start_all, stub_environment
+
+CITIES = ['London', 'Paris', 'Tokyo', 'Delhi', 'Lagos', 'Lima', 'Oslo', 'Cairo']
+CATEGORIES = ['general', 'technology', 'science', 'sports', 'business']
+_unique = itertools.count()
+
+
+def chat_request(index):
+    return 'POST', '/chat', {'message': f'Explain topic {next(_unique)}'}
+
+
+def chat_cached_request(index):
+    return 'POST', '/chat', {'message': 'Explain photosynthesis'}
+
+
+def chat_stream_request(index):
+    return 'POST', '/chat/stream', {'message': f'Stream topic {next(_unique)}'}
+
+
+def news_request(index):
+    return 'GET', f'/news?category={CATEGORIES[index % len(CATEGORIES)]}', None
+
+
+def weather_request(index):
+    return 'GET', f'/weather?city={CITIES[index % len(CITIES)]}', None
+
+
+def dashboard_request(index):
+    return 'GET', '/dashboard', None
+
+
+def flashcards_request(index):
+    return 'GET', '/flashcards?limit=50', None
+
+
+def tasks_request(index):
+    return 'GET', '/study_planner/tasks?limit=50', None
+
+
+def attendance_stats_request(index):
+    return 'GET', '/attendance/stats', None
+
+
+# Roughly what the frontend does on a page load plus a chat turn
+MIXED = [dashboard_request, news_request, weather_request, flashcards_request,
+         flashcards_request, tasks_request, tasks_request, chat_request]
+
+
+def mixed_request(index):
+    return MIXED[index % len(MIXED)](index)
+
+
+SCENARIOS = {
+    'chat': chat_request,
+    'chat_cached': chat_cached_request,
+    'chat_stream': chat_stream_request,
+    'news': news_request,
+    'weather': weather_request,
+    'dashboard': dashboard_request,
+    'flashcards': flashcards_request,
+    'tasks': tasks_request,
+    'attendance_stats': attendance_stats_request,
+    'mixed': mixed_request,
+}
+
+
+class AppServer:
+    """Serve the Flask app from a background thread on a free local port."""
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+        self._server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.url = f'http://127.0.0.1:{self._server.server_port}'
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+
+def run_scenario(base_url, name, make_request, total, concurrency, stubs):
+    local = threading.local()
+    before = {kind: stub.requests for kind, stub in stubs.items()}
+
+    def one(index):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        method, path, body = make_request(index)
+        started = time.perf_counter()
+        try:
+            response = session.request(method, base_url + path, json=body, timeout=60)
+            response.content  # Streams count until the last byte arrives
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    result = summarize(name, [duration for duration, _ in outcomes],
+                       concurrency=concurrency, latency=stubs['groq'].latency)
+    result['errors'] = sum(1 for _, ok in outcomes if not ok)
+    result['throughput_rps'] = round(total / elapsed, 2) if elapsed else 0.0
+    result['upstream_requests'] = {kind: stub.requests - before[kind] for kind, stub in stubs.items()}
+    print(f"{name:<20} {result['throughput_rps']:>8.1f} req/s  p50 {result['p50_ms']:>9.1f} ms"
+          f"  p95 {result['p95_ms']:>9.1f} ms  p99 {result['p99_ms']:>9.1f} ms"
+          f"  errors {result['errors']}  upstream {result['upstream_requests']}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Raiden AI load scenarios')
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), action='append',
+                        help='run only this scenario (repeatable)')
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.1, help='seconds added by every stub')
+    parser.add_argument('--rows', type=int, default=10000, help='rows seeded into each table')
+    parser.add_argument('--cold', action='store_true', help='disable the news/weather cache')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/...)')
+    args = parser.parse_args()
+
+    stubs = start_all(args.latency)
+    directory = tempfile.mkdtemp(prefix='raiden-load-')
+    # Module-level settings are read at import, so configure before importing the app
+    os.environ.update(stub_environment(stubs))
+    os.environ['DATABASE_PATH'] = os.path.join(directory, 'load.db')
+    os.environ['REVIEW_SCHEDULER'] = '0'
+    if args.cold:
+        os.environ.update({'NEWS_CACHE_TTL': '0', 'WEATHER_CACHE_TTL': '0', 'UPSTREAM_STALE_TTL': '0'})
+
+    import database
+    import server
+    from benchmarks.micro import populate
+
+    # Per-request access logs would drown the summary lines
+    logging.getLogger('raiden').setLevel(logging.WARNING)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    db = database.connect(server.DATABASE)
+    populate(db, args.rows)
+    db.close()
+
+    app_server = AppServer(server.app).start()
+    try:
+        results = []
+        for name in args.scenario or SCENARIOS:
+            result = run_scenario(app_server.url, name, SCENARIOS[name], args.requests,
+                                  args.concurrency, stubs)
+            result['params'].update(rows=args.rows, cold=args.cold)
+            results.append(result)
+        write_results('load', results, args.output)
+    finally:
+        app_server.stop()
+        for stub in stubs.values():
+            stub.stop()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
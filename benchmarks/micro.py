@@ -0,0 +1,246 @@
+"""
+Micro-benchmarks for the hot paths behind the API.
+
+    python -m benchmarks.micro                     # everything, default sizes
+    python -m benchmarks.micro --only sqlite --sizes 1000,10000,100000
+    python -m benchmarks.micro --quick             # fewer repeats, smaller tables
+
+Each benchmark calls the library code directly (no HTTP), so results track
+the cost of the work itself. Results are written as JSON to
+benchmarks/results/ (see compare.py).
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+from datetime import date, datetime, timedelta
+
+from benchmarks.common import measure, write_results, make_pdf
+
+import attendance
+import database
+import migrations
+import spaced_repetition
+from math_engine import MathSolver
+from pdf_extract import extract_pages, extract_in_pool, extract_text, PDF_WORKERS
+from sandbox import SandboxPool
+
+MATH_PROBLEMS = ['2 + 3 * 4', 'sqrt(2) * pi', '(x + 1)**5', 'sin(x)**2 + cos(x)**2',
+                 'integrate(x**2, x)', 'diff(exp(x) * sin(x), x)']
+
+
+def solve_uncached(solver, problem):
+    solver.parsed.clear()
+    solver.results.clear()
+    return solver.solve(problem)
+
+
+def bench_math(repeat):
+    results = []
+    solver = MathSolver(workers=2)
+    try:
+        for problem in MATH_PROBLEMS:
+            # Memos are cleared before every call so each one runs the full
+            # parse/simplify/expand/evalf pipeline in the (already started) workers
+            results.append(measure('solve_math.solve', lambda: solve_uncached(solver, problem),
+                                   max(1, repeat // 5), problem=problem))
+        results.append(measure('solve_math.memo_hit', lambda: solver.solve(MATH_PROBLEMS[0]), repeat))
+        counter = iter(range(10 ** 9))
+        # A new expression every call misses both the parse and result memos
+        results.append(measure(
+            'solve_math.cold', lambda: solver.solve(f'(x + {next(counter)})**3'), repeat
+        ))
+        numeric = [f'{i} * {i + 1} / 7' for i in range(100)]
+        results.append(measure('solve_math.batch', lambda: solver.solve_batch(numeric),
+                               max(1, repeat // 5), problems=len(numeric)))
+        results.append(measure(
+            'solve_math.batch_vectorized',
+            lambda: solver.solve_batch(['sin(x) * x**2', 'exp(-x) + x'],
+                                       {'x': {'start': 0, 'stop': 10, 'num': 10000}}),
+            max(1, repeat // 5), points=10000
+        ))
+    finally:
+        solver.pool.shutdown()
+    return results
+
+
+def bench_pdf(repeat, page_counts):
+    results = []
+    for pages in page_counts:
+        data = make_pdf(pages)
+        results.append(measure('pdf.extract_inline', lambda: extract_pages(data),
+                               max(1, repeat // 5), pages=pages))
+        if PDF_WORKERS > 0:
+            results.append(measure('pdf.extract_pool', lambda: extract_in_pool(data),
+                                   max(1, repeat // 5), pages=pages))
+        results.append(measure('pdf.extract_cached', lambda: extract_text(data),
+                               repeat, pages=pages))
+    return results
+
+
+def bench_run_code(repeat):
+    results = []
+    pool = SandboxPool(size=2)
+    try:
+        snippet = 'total = 0\nfor i in range(1000):\n    total += i * i\nprint(total)'
+        results.append(measure('run_code.cached', lambda: pool.run(snippet), repeat))
+        counter = iter(range(10 ** 9))
+        results.append(measure(
+            'run_code.uncached', lambda: pool.run(f'{snippet}\n# {next(counter)}'), repeat
+        ))
+        heavy = 'print(sum(i * i for i in range(2000000)))'
+        results.append(measure('run_code.cpu_bound', lambda: pool._execute(heavy),
+                               max(1, repeat // 5)))
+    finally:
+        pool.shutdown()
+    return results
+
+
+def populate(db, size):
+    """Insert size flashcards, tasks and attendance rows."""
+    rng = random.Random(size)
+    today = date.today()
+    db.executemany(
+        'INSERT INTO flashcards (front, back, category) VALUES (?, ?, ?)',
+        ((f'Question {i} about topic{i % 500}', f'Answer {i} mentions keyword{i % 97}',
+          f'Category {i % 20}') for i in range(size))
+    )
+    db.executemany(
+        'INSERT INTO tasks (task, due_date, completed) VALUES (?, ?, ?)',
+        ((f'Task {i}', (today + timedelta(days=rng.randint(-30, 60))).isoformat(), i % 3 == 0)
+         for i in range(size))
+    )
+    db.executemany(
+        'INSERT INTO attendance (student_name, date, subject, status) VALUES (?, ?, ?, ?)',
+        ((f'student{i % 300}', (today - timedelta(days=i % 365)).isoformat(),
+          f'subject{i % 8}', rng.choice(['present', 'present', 'present', 'absent', 'late']))
+         for i in range(size))
+    )
+    db.commit()
+    db.execute('ANALYZE')
+
+
+def bench_sqlite(repeat, sizes):
+    results = []
+    directory = tempfile.mkdtemp(prefix='raiden-bench-')
+    try:
+        for size in sizes:
+            db = database.connect(os.path.join(directory, f'bench-{size}.db'))
+            migrations.migrate(db)
+            populate(db, size)
+
+            results.append(measure(
+                'sqlite.flashcards_full_scan',
+                lambda: db.execute('SELECT * FROM flashcards ORDER BY created_at DESC').fetchall(),
+                max(1, repeat // 5), rows=size
+            ))
+            results.append(measure(
+                'sqlite.flashcards_first_page',
+                lambda: database.keyset_page(db, 'flashcards', 'created_at', True, limit=50),
+                repeat, rows=size
+            ))
+            middle = db.execute(
+                'SELECT created_at, id FROM flashcards ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET ?',
+                (size // 2,)
+            ).fetchone()
+            cursor = database.encode_cursor([middle[0], middle[1]])
+            results.append(measure(
+                'sqlite.flashcards_deep_page',
+                lambda: database.keyset_page(db, 'flashcards', 'created_at', True,
+                                             limit=50, cursor=cursor),
+                repeat, rows=size
+            ))
+            results.append(measure(
+                'sqlite.flashcards_category',
+                lambda: database.keyset_page(db, 'flashcards', 'created_at', True,
+                                             ['category = ?'], ['Category 7'], limit=50),
+                repeat, rows=size
+            ))
+            now = spaced_repetition.timestamp(datetime.utcnow())
+            results.append(measure(
+                'sqlite.flashcards_due',
+                lambda: database.keyset_page(db, 'flashcards', 'next_due', False,
+                                             ['next_due <= ?'], [now], limit=50),
+                repeat, rows=size
+            ))
+            results.append(measure(
+                'sqlite.flashcards_search',
+                lambda: db.execute(
+                    "SELECT rowid FROM flashcards_fts WHERE flashcards_fts MATCH ? "
+                    "ORDER BY bm25(flashcards_fts) LIMIT 20", ('"keyword4"*',)
+                ).fetchall(),
+                repeat, rows=size
+            ))
+            results.append(measure(
+                'sqlite.tasks_open',
+                lambda: database.keyset_page(db, 'tasks', 'due_date', False,
+                                             ['completed = ?'], [False], limit=50),
+                repeat, rows=size
+            ))
+            month_start = date.today().replace(day=1)
+            results.append(measure(
+                'sqlite.attendance_month',
+                lambda: database.keyset_page(db, 'attendance', 'date', True,
+                                             ['date >= ?'], [month_start.isoformat()], limit=500),
+                repeat, rows=size
+            ))
+            results.append(measure(
+                'sqlite.attendance_stats',
+                lambda: attendance.stats(db, subject='subject3'),
+                max(1, repeat // 5), rows=size
+            ))
+            results.append(measure(
+                'sqlite.attendance_stats_streaks',
+                lambda: attendance.stats(db, subject='subject3', include_streaks=True),
+                max(1, repeat // 5), rows=size
+            ))
+            db.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+SUITES = ('math', 'pdf', 'run_code', 'sqlite')
+DEFAULTS = {'repeat': 50, 'sizes': '1000,10000,100000', 'pages': '10,50,200'}
+QUICK_DEFAULTS = {'repeat': 10, 'sizes': '1000,10000', 'pages': '10,50'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Raiden AI micro-benchmarks')
+    parser.add_argument('--only', choices=SUITES, action='append',
+                        help='run only this group (repeatable)')
+    parser.add_argument('--repeat', type=int, help='timed calls per benchmark (default 50)')
+    parser.add_argument('--sizes', help='comma-separated table sizes for the SQLite benchmarks '
+                                        '(default 1000,10000,100000)')
+    parser.add_argument('--pages', help='comma-separated page counts for the PDF benchmarks '
+                                        '(default 10,50,200)')
+    parser.add_argument('--quick', action='store_true',
+                        help='defaults of repeat=10, sizes=1000,10000, pages=10,50; '
+                             'explicit options still win')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/...)')
+    args = parser.parse_args()
+
+    defaults = QUICK_DEFAULTS if args.quick else DEFAULTS
+    for name, value in defaults.items():
+        if getattr(args, name) is None:
+            setattr(args, name, value)
+    sizes = [int(s) for s in args.sizes.split(',')]
+    pages = [int(p) for p in args.pages.split(',')]
+    groups = args.only or SUITES
+
+    results = []
+    if 'math' in groups:
+        results += bench_math(args.repeat)
+    if 'pdf' in groups:
+        results += bench_pdf(args.repeat, pages)
+    if 'run_code' in groups:
+        results += bench_run_code(args.repeat)
+    if 'sqlite' in groups:
+        results += bench_sqlite(args.repeat, sizes)
+    write_results('micro', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
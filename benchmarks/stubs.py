@@ -0,0 +1,194 @@
+"""
+Local stand-ins for Groq, GNews and OpenWeather with injectable latency.
+
+Each stub is a threaded HTTP server on 127.0.0.1 answering with canned
+JSON shaped like the real API. Latency is added before every response and
+can be changed while the server runs:
+
+    stub = StubServer('groq', latency=0.2)
+    stub.start()
+    os.environ['GROQ_BASE_URL'] = stub.url
+    stub.latency = 0.5
+
+Run this module directly to keep all three stubs up for manual testing.
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+def groq_completion(body):
+    prompt = body.get('messages', [{}])[-1].get('content', '')
+    return {
+        'id': 'stub-completion',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': body.get('model', 'stub'),
+        'choices': [{
+            'index': 0,
+            'finish_reason': 'stop',
+            'logprobs': None,
+            'message': {'role': 'assistant', 'content': f'Stub answer to: {prompt[:200]}'}
+        }],
+        'usage': {'prompt_tokens': 10, 'completion_tokens': 10, 'total_tokens': 20}
+    }
+
+
+def groq_chunks(body, tokens=20):
+    for index in range(tokens):
+        yield {
+            'id': 'stub-completion',
+            'object': 'chat.completion.chunk',
+            'created': int(time.time()),
+            'model': body.get('model', 'stub'),
+            'choices': [{'index': 0, 'delta': {'content': f'tok{index} '},
+                         'finish_reason': None, 'logprobs': None}]
+        }
+
+
+def gnews_headlines(query):
+    count = int(query.get('max', ['10'])[0])
+    category = query.get('category', ['general'])[0]
+    return {
+        'totalArticles': count,
+        'articles': [{
+            'title': f'Stub {category} headline {i}',
+            'description': 'Stub description',
+            'url': f'https://example.com/{category}/{i}',
+            'publishedAt': '2024-01-01T00:00:00Z',
+            'source': {'name': 'Stub', 'url': 'https://example.com'}
+        } for i in range(count)]
+    }
+
+
+def openweather_current(query):
+    city = query.get('q', ['London'])[0]
+    return {
+        'name': city,
+        'main': {'temp': 18.5, 'feels_like': 17.9, 'humidity': 60},
+        'weather': [{'main': 'Clouds', 'description': 'scattered clouds'}],
+        'wind': {'speed': 3.1}
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _delay(self):
+        self.server.stub.count_request()
+        if self.server.stub.latency:
+            time.sleep(self.server.stub.latency)
+
+    def do_GET(self):
+        self._delay()
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        kind = self.server.stub.kind
+        if kind == 'gnews' and url.path.endswith('/top-headlines'):
+            return self._send_json(gnews_headlines(query))
+        if kind == 'openweather' and url.path.endswith('/weather'):
+            return self._send_json(openweather_current(query))
+        self._send_json({'error': 'not found'}, 404)
+
+    def do_POST(self):
+        self._delay()
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        if self.server.stub.kind != 'groq' or not self.path.endswith('/chat/completions'):
+            return self._send_json({'error': 'not found'}, 404)
+        if not body.get('stream'):
+            return self._send_json(groq_completion(body))
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        events = [f'data: {json.dumps(chunk)}\n\n' for chunk in groq_chunks(body)]
+        events.append('data: [DONE]\n\n')
+        for event in events:
+            data = event.encode('utf-8')
+            self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+
+class StubServer:
+    """One stub upstream ('groq', 'gnews' or 'openweather') on a free local port."""
+
+    BASE_PATHS = {'groq': '', 'gnews': '/api/v4', 'openweather': '/data/2.5'}
+
+    def __init__(self, kind, latency=0.0, port=0):
+        if kind not in self.BASE_PATHS:
+            raise ValueError(f'Unknown stub kind {kind!r}')
+        self.kind = kind
+        self.latency = latency
+        self.requests = 0
+        self._requests_lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+
+    def count_request(self):
+        # Handler threads run concurrently; the count backs the coalescing figures
+        with self._requests_lock:
+            self.requests += 1
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}{self.BASE_PATHS[self.kind]}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def start_all(latency=0.0):
+    """Start all three stubs and return {kind: StubServer}."""
+    return {kind: StubServer(kind, latency).start() for kind in StubServer.BASE_PATHS}
+
+
+def stub_environment(stubs):
+    """Environment variables that point the app at the given stubs."""
+    return {
+        'GROQ_BASE_URL': stubs['groq'].url,
+        'GROQ_API_KEY': 'stub-key',
+        'GNEWS_BASE_URL': stubs['gnews'].url,
+        'GNEWS_API_KEY': 'stub-key',
+        'OPENWEATHER_BASE_URL': stubs['openweather'].url,
+        'OPENWEATHER_API_KEY': 'stub-key',
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.1, help='seconds added to every response')
+    args = parser.parse_args()
+    servers = start_all(args.latency)
+    for name, value in stub_environment(servers).items():
+        print(f'export {name}={value}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,321 @@
+"""
+Pooled SQLite connections for raiden.db.
+
+Each thread keeps one open connection per database file for its whole
+life instead of connecting on every request. Connections are opened in WAL mode with tuned pragmas so
+readers never block the single writer, and sqlite3's per-connection
+statement cache keeps prepared statements around for reuse.
+"""
+
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import telemetry
+
+DATABASE = os.getenv('DATABASE_PATH', 'raiden.db')
+
+DB_BUSY_TIMEOUT = float(os.getenv('DB_BUSY_TIMEOUT', '10'))
+DB_CACHE_KB = int(os.getenv('DB_CACHE_KB', '16384'))
+DB_MMAP_BYTES = int(os.getenv('DB_MMAP_BYTES', str(128 * 1024 * 1024)))
+DB_STATEMENT_CACHE = int(os.getenv('DB_STATEMENT_CACHE', '256'))
+
+_local = threading.local()
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection that reports statement execution time to telemetry."""
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            telemetry.observe_query(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            telemetry.observe_query(sql, time.perf_counter() - started)
+
+
+def connect(path=DATABASE):
+    """Open a new tuned connection to path."""
+    db = sqlite3.connect(
+        path,
+        timeout=DB_BUSY_TIMEOUT,
+        cached_statements=DB_STATEMENT_CACHE,
+        check_same_thread=False,
+        factory=TimedConnection
+    )
+    db.row_factory = sqlite3.Row
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('PRAGMA synchronous=NORMAL')
+    db.execute(f'PRAGMA cache_size=-{DB_CACHE_KB}')
+    db.execute(f'PRAGMA mmap_size={DB_MMAP_BYTES}')
+    db.execute('PRAGMA temp_store=MEMORY')
+    db.execute(f'PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT * 1000)}')
+    return db
+
+
+def get_connection(path=DATABASE):
+    """Return this thread's connection to path, opening it on first use."""
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    db = connections.get(path)
+    if db is None:
+        db = connections[path] = connect(path)
+    return db
+
+
+def release_connection(path=DATABASE):
+    """Return the connection to a clean state at the end of a request.
+
+    The connection itself stays open for the next request on this thread;
+    only a transaction left open by an error is rolled back.
+    """
+    db = getattr(_local, 'connections', {}).get(path)
+    if db is not None and db.in_transaction:
+        db.rollback()
+
+
+def close_connection(path=DATABASE):
+    connections = getattr(_local, 'connections', {})
+    db = connections.pop(path, None)
+    if db is not None:
+        db.close()
+
+
+def table_columns(db, table):
+    return [row[1] for row in db.execute(f'PRAGMA table_info({table})')]
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        sort_value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return sort_value, int(last_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+
+def _keyset_query(db, table, sort_column, descending, where, params, fields, limit, cursor):
+    columns = table_columns(db, table)
+    if fields:
+        unknown = [f for f in fields if f not in columns]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    else:
+        fields = columns
+    selected = list(dict.fromkeys(list(fields) + [sort_column, 'id']))
+
+    clauses = list(where or [])
+    params = list(params)
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor)
+        clauses.append(f"({sort_column}, id) {'<' if descending else '>'} (?, ?)")
+        params += [sort_value, last_id]
+
+    order = 'DESC' if descending else 'ASC'
+    sql = f"SELECT {', '.join(selected)} FROM {table}"
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    sql += f' ORDER BY {sort_column} {order}, id {order}'
+    if limit:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    return sql, params, fields
+
+
+def keyset_page(db, table, sort_column, descending=False, where=None, params=(),
+                fields=None, limit=None, cursor=None):
+    """Select one page of table ordered by (sort_column, id).
+
+    Pages continue from an opaque cursor instead of an OFFSET, so each page
+    costs the same however deep it is. Returns (rows as dicts, next cursor
+    or None). fields restricts the returned columns.
+    """
+    # One extra row tells us whether another page exists
+    sql, params, fields = _keyset_query(
+        db, table, sort_column, descending, where, params, fields,
+        limit + 1 if limit else None, cursor
+    )
+    rows = db.execute(sql, params).fetchall()
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last[sort_column], last['id']])
+    return [{field: row[field] for field in fields} for row in rows], next_cursor
+
+
+def iter_keyset(db, table, sort_column, descending=False, where=None, params=(),
+                fields=None, limit=None, cursor=None, batch_size=500):
+    """Like keyset_page, but yields lists of row dicts batch by batch.
+
+    Rows are pulled from the cursor with fetchmany, so memory stays
+    constant however many rows match. The query is validated before the
+    first batch is requested, so bad fields or cursors raise immediately.
+    """
+    sql, params, fields = _keyset_query(
+        db, table, sort_column, descending, where, params, fields, limit, cursor
+    )
+    rows = db.execute(sql, params)
+
+    def batches():
+        try:
+            while True:
+                batch = rows.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield [{field: row[field] for field in fields} for row in batch]
+        finally:
+            rows.close()
+
+    return batches()
+
+
+def _existing_ids(db, table, ids):
+    # json_each keeps this to one bound parameter however many ids there are
+    rows = db.execute(
+        f'SELECT id FROM {table} WHERE id IN (SELECT value FROM json_each(?))',
+        (json.dumps(ids),)
+    )
+    return {row[0] for row in rows}
+
+
+def _next_id(db, table):
+    # AUTOINCREMENT hands out max(sqlite_sequence, max rowid) + 1
+    row = db.execute(
+        f"SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0), "
+        f"COALESCE((SELECT MAX(id) FROM {table}), 0))",
+        (table,)
+    ).fetchone()
+    return row[0] + 1
+
+
+# SQLite INTEGER range; larger Python ints cannot be bound
+_MIN_INT, _MAX_INT = -2 ** 63, 2 ** 63 - 1
+
+
+def _invalid_value(operation, columns, required):
+    """Return an error message for the first unusable column value, if any."""
+    for column in columns:
+        value = operation.get(column)
+        if value is not None and not isinstance(value, (str, int, float)):
+            return f'{column} must be a string, number, boolean or null'
+        if isinstance(value, int) and not _MIN_INT <= value <= _MAX_INT:
+            return f'{column} is out of range'
+        if column in required and (value is None or value == ''):
+            return f'{column} cannot be empty'
+    return None
+
+
+def bulk_write(db, table, operations, defaults, required=()):
+    """Apply a list of create/update/delete operations in one transaction.
+
+    Each operation is a dict with 'op' set to 'create' (columns from
+    defaults), 'update' ('id' plus the columns to change) or 'delete'
+    ('id'). Values must be scalars, and required columns may not be set
+    to null or '' by either a create or an update. Valid operations are
+    grouped and run with executemany, creates first, then updates, then
+    deletes; invalid ones are skipped with an error of their own. Returns
+    one result dict per operation, in order.
+    """
+    results = [None] * len(operations)
+    creates = []
+    updates = {}
+    targets = []
+    deletes = []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            results[index] = {'index': index, 'error': 'Operation must be an object'}
+            continue
+        kind = operation.get('op')
+        if kind == 'create':
+            missing = [column for column in required if not operation.get(column)]
+            if missing:
+                results[index] = {'index': index, 'op': kind,
+                                  'error': f"Missing field(s): {', '.join(missing)}"}
+                continue
+            error = _invalid_value(operation, [c for c in defaults if c in operation], required)
+            if error:
+                results[index] = {'index': index, 'op': kind, 'error': error}
+                continue
+            creates.append((index, tuple(operation.get(c, d) for c, d in defaults.items())))
+        elif kind in ('update', 'delete'):
+            try:
+                row_id = int(operation['id'])
+            except (KeyError, TypeError, ValueError):
+                results[index] = {'index': index, 'op': kind, 'error': 'A numeric id is required'}
+                continue
+            if kind == 'delete':
+                deletes.append((index, row_id))
+                continue
+            columns = tuple(c for c in defaults if c in operation)
+            if not columns:
+                results[index] = {'index': index, 'op': kind, 'id': row_id,
+                                  'error': 'No fields to update'}
+                continue
+            error = _invalid_value(operation, columns, required)
+            if error:
+                results[index] = {'index': index, 'op': kind, 'id': row_id, 'error': error}
+                continue
+            updates.setdefault(columns, []).append(
+                (index, row_id, tuple(operation[c] for c in columns))
+            )
+            targets.append(row_id)
+        else:
+            results[index] = {'index': index, 'error': 'op must be create, update or delete'}
+
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        if creates:
+            # The write lock is held, so the new ids are consecutive
+            first_id = _next_id(db, table)
+            columns = ', '.join(defaults)
+            placeholders = ', '.join('?' * len(defaults))
+            db.executemany(
+                f'INSERT INTO {table} ({columns}) VALUES ({placeholders})',
+                [values for _, values in creates]
+            )
+            for offset, (index, _) in enumerate(creates):
+                results[index] = {'index': index, 'op': 'create', 'id': first_id + offset}
+
+        # Checked after the inserts so later operations can target new rows
+        existing = _existing_ids(db, table, targets + [row_id for _, row_id in deletes])
+
+        for columns, items in updates.items():
+            found = [item for item in items if item[1] in existing]
+            assignments = ', '.join(f'{c} = ?' for c in columns)
+            db.executemany(
+                f'UPDATE {table} SET {assignments} WHERE id = ?',
+                [values + (row_id,) for _, row_id, values in found]
+            )
+            for index, row_id, _ in items:
+                results[index] = {'index': index, 'op': 'update', 'id': row_id}
+                if row_id not in existing:
+                    results[index]['error'] = 'Not found'
+
+        db.executemany(
+            f'DELETE FROM {table} WHERE id = ?',
+            [(row_id,) for _, row_id in deletes if row_id in existing]
+        )
+        for index, row_id in deletes:
+            results[index] = {'index': index, 'op': 'delete', 'id': row_id}
+            if row_id not in existing:
+                results[index]['error'] = 'Not found'
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return results
@@ -0,0 +1,194 @@
+"""
+Process-wide Groq client manager.
+
+Every LLM-calling route goes through one shared Groq client so HTTP
+connections (and their TLS sessions) are kept alive and reused between
+requests. Calls are capped by a concurrency limit and 429/5xx responses
+are retried with exponential backoff. Completions are served from an
+optional response cache (see llm_cache.py) when the same request repeats.
+"""
+
+import os
+import random
+import threading
+import time
+
+import httpx
+from groq import Groq, APIConnectionError, APIStatusError, APITimeoutError
+
+import telemetry
+from llm_cache import make_key
+
+DEFAULT_MODEL = "llama3-8b-8192"
+
+# Tunables (environment overrides)
+GROQ_BASE_URL = os.getenv('GROQ_BASE_URL')
+GROQ_MAX_CONNECTIONS = int(os.getenv('GROQ_MAX_CONNECTIONS', '20'))
+GROQ_MAX_KEEPALIVE = int(os.getenv('GROQ_MAX_KEEPALIVE', '10'))
+GROQ_MAX_CONCURRENCY = int(os.getenv('GROQ_MAX_CONCURRENCY', '8'))
+GROQ_QUEUE_TIMEOUT = float(os.getenv('GROQ_QUEUE_TIMEOUT', '30'))
+GROQ_TIMEOUT = float(os.getenv('GROQ_TIMEOUT', '30'))
+GROQ_MAX_RETRIES = int(os.getenv('GROQ_MAX_RETRIES', '3'))
+GROQ_BACKOFF_BASE = float(os.getenv('GROQ_BACKOFF_BASE', '0.5'))
+GROQ_BACKOFF_MAX = float(os.getenv('GROQ_BACKOFF_MAX', '8'))
+
+
+class GroqBusyError(Exception):
+    """Raised when no concurrency slot frees up within the queue timeout."""
+
+
+def is_retryable(error):
+    if isinstance(error, (APIConnectionError, APITimeoutError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+class GroqClientManager:
+    def __init__(self, api_key, base_url=None, max_connections=GROQ_MAX_CONNECTIONS,
+                 max_keepalive=GROQ_MAX_KEEPALIVE, max_concurrency=GROQ_MAX_CONCURRENCY,
+                 queue_timeout=GROQ_QUEUE_TIMEOUT, timeout=GROQ_TIMEOUT,
+                 max_retries=GROQ_MAX_RETRIES, backoff_base=GROQ_BACKOFF_BASE,
+                 backoff_max=GROQ_BACKOFF_MAX, transport=None, cache=None):
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive
+            ),
+            timeout=timeout,
+            transport=transport
+        )
+        # Retries are handled here so they respect the concurrency limit
+        self.client = Groq(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=self.http_client,
+            timeout=timeout,
+            max_retries=0
+        )
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.cache = cache
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise GroqBusyError('Too many concurrent AI requests, please retry shortly')
+
+    def _backoff(self, attempt, error):
+        retry_after = None
+        if isinstance(error, APIStatusError):
+            retry_after = error.response.headers.get('retry-after')
+        try:
+            delay = float(retry_after)
+        except (TypeError, ValueError):
+            delay = self.backoff_base * (2 ** attempt) * (0.5 + random.random())
+        return min(delay, self.backoff_max)
+
+    def _create(self, timeout=None, **params):
+        attempt = 0
+        while True:
+            self._acquire()
+            try:
+                with telemetry.timed_upstream('groq'):
+                    result = self.client.chat.completions.create(
+                        timeout=timeout or self.timeout, **params
+                    )
+            except Exception as e:
+                self._slots.release()
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = self._backoff(attempt, e)
+            else:
+                # Streams keep their slot until the caller closes them
+                if not params.get('stream'):
+                    self._slots.release()
+                return result
+            time.sleep(delay)
+            attempt += 1
+
+    def _cache_key(self, use_cache, model, messages, temperature, max_tokens):
+        if self.cache is None or not use_cache:
+            return None
+        return make_key(model, messages, temperature, max_tokens)
+
+    def complete(self, messages, model=DEFAULT_MODEL, temperature=0.7, max_tokens=1000,
+                 timeout=None, use_cache=True):
+        """Run a chat completion and return the message text."""
+        key = self._cache_key(use_cache, model, messages, temperature, max_tokens)
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        response = self._create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout
+        )
+        text = response.choices[0].message.content
+        if key and text:
+            self.cache.set(key, text)
+        return text
+
+    def stream(self, messages, model=DEFAULT_MODEL, temperature=0.7, max_tokens=1000,
+               timeout=None, use_cache=True):
+        """Yield completion tokens as they arrive.
+
+        The concurrency slot is held for the life of the stream; closing the
+        generator closes the upstream HTTP response and frees the slot. A
+        cached response is yielded as a single token.
+        """
+        key = self._cache_key(use_cache, model, messages, temperature, max_tokens)
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        stream = self._create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout,
+            stream=True
+        )
+        tokens = []
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content
+                if token:
+                    tokens.append(token)
+                    yield token
+            # Only complete streams are cached, never cancelled ones
+            if key and tokens:
+                self.cache.set(key, ''.join(tokens))
+        finally:
+            stream.close()
+            self._slots.release()
+
+    def close(self):
+        self.http_client.close()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_manager(api_key, cache=None):
+    """Return the process-wide manager, creating it on first use."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = GroqClientManager(api_key, base_url=GROQ_BASE_URL, cache=cache)
+    return _manager
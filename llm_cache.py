@@ -0,0 +1,164 @@
+"""
+Response cache for LLM completions.
+
+Keys are a hash of (model, normalized messages, temperature, max_tokens).
+Entries live in an in-memory LRU tier and, optionally, in an SQLite table
+inside raiden.db so they survive restarts. Both tiers are bounded by entry
+count and TTL.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import database
+
+LLM_CACHE_SIZE = int(os.getenv('LLM_CACHE_SIZE', '512'))
+LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', '3600'))
+LLM_CACHE_PERSIST = os.getenv('LLM_CACHE_PERSIST', '0') == '1'
+LLM_CACHE_DB_SIZE = int(os.getenv('LLM_CACHE_DB_SIZE', '10000'))
+
+# Prune the persistent tier once every this many writes
+PRUNE_EVERY = 100
+
+
+def normalize_messages(messages):
+    return [
+        {'role': m.get('role', 'user'), 'content': ' '.join(str(m.get('content', '')).split())}
+        for m in messages
+    ]
+
+
+def make_key(model, messages, temperature, max_tokens):
+    payload = json.dumps({
+        'model': model,
+        'messages': normalize_messages(messages),
+        'temperature': temperature,
+        'max_tokens': max_tokens
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, max_entries=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL, db_path=None,
+                 max_db_entries=LLM_CACHE_DB_SIZE):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self.max_db_entries = max_db_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.persistent_hits = 0
+        if self.db_path:
+            self._init_table()
+
+    def _connect(self):
+        # Shared per-thread connection; never closed here
+        return database.get_connection(self.db_path)
+
+    def _init_table(self):
+        db = self._connect()
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        db.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_created_at ON llm_cache(created_at)')
+        db.commit()
+
+    def _remember(self, key, value, created_at):
+        self._entries[key] = (value, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.db_path:
+            row = self._db_get(key, now)
+            if row is not None:
+                value, created_at = row
+                # Keep the row's age so the entry expires when the row does
+                with self._lock:
+                    self._remember(key, value, created_at)
+                    self.hits += 1
+                    self.persistent_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+        if self.db_path:
+            self._db_set(key, value, now)
+
+    def _db_get(self, key, now):
+        try:
+            row = self._connect().execute(
+                'SELECT response, created_at FROM llm_cache WHERE key = ? AND created_at > ?',
+                (key, now - self.ttl)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        return (row[0], row[1]) if row else None
+
+    def _db_set(self, key, value, now):
+        try:
+            db = self._connect()
+            db.execute(
+                'INSERT OR REPLACE INTO llm_cache (key, response, created_at) VALUES (?, ?, ?)',
+                (key, value, now)
+            )
+            self._writes += 1
+            if self._writes % PRUNE_EVERY == 0:
+                db.execute('DELETE FROM llm_cache WHERE created_at <= ?', (now - self.ttl,))
+                db.execute("""
+                    DELETE FROM llm_cache WHERE key IN (
+                        SELECT key FROM llm_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_db_entries,))
+            db.commit()
+        except sqlite3.Error:
+            # The cache is best-effort; never fail a request because of it
+            pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'persistent': bool(self.db_path),
+                'hits': self.hits,
+                'persistent_hits': self.persistent_hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
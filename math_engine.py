@@ -0,0 +1,344 @@
+"""
+Memoized, time-bounded math solving pipeline.
+
+Each stage (parse, simplify, expand, evalf) runs in a pooled worker
+process under its own time budget, so a pathological simplify cannot tie
+up a web worker. When a stage overruns, the steps computed so far are
+returned and the response is marked partial. Complete results are
+memoized on the canonical srepr of the parsed expression.
+
+Batches are deduplicated and every item that is numeric (or whose free
+symbols are bound to value ranges) is evaluated in one vectorized NumPy
+pass via sympy.lambdify; the rest fall back to the per-item pipeline.
+"""
+
+import math
+import os
+import threading
+from functools import lru_cache
+from tokenize import TokenError
+
+import sympy as sp
+from sympy.parsing.sympy_parser import parse_expr
+
+try:
+    import numpy as np
+except ImportError:  # Batches then fall back to per-item solving
+    np = None
+
+from llm_cache import ResponseCache
+from sandbox import WorkerPool, WorkerTimeout, WorkerLimitExceeded
+
+MATH_WORKERS = int(os.getenv('MATH_WORKERS', '2'))
+MATH_MEMORY_MB = int(os.getenv('MATH_MEMORY_MB', '512'))
+MATH_CACHE_SIZE = int(os.getenv('MATH_CACHE_SIZE', '1024'))
+MATH_CACHE_TTL = float(os.getenv('MATH_CACHE_TTL', '86400'))
+
+# Per-stage wall-clock budgets in seconds
+STAGE_BUDGETS = {
+    'parse': float(os.getenv('MATH_PARSE_BUDGET', '2')),
+    'simplify': float(os.getenv('MATH_SIMPLIFY_BUDGET', '3')),
+    'expand': float(os.getenv('MATH_EXPAND_BUDGET', '2')),
+    'evalf': float(os.getenv('MATH_EVALF_BUDGET', '2')),
+    'vectorize': float(os.getenv('MATH_BATCH_BUDGET', '5')),
+}
+
+MATH_BATCH_MAX_PROBLEMS = int(os.getenv('MATH_BATCH_MAX_PROBLEMS', '200'))
+MATH_BATCH_MAX_POINTS = int(os.getenv('MATH_BATCH_MAX_POINTS', '10000'))
+
+
+class MathError(ValueError):
+    """The problem could not be parsed or evaluated."""
+
+
+@lru_cache(maxsize=256)
+def _from_srepr(key):
+    return sp.sympify(key)
+
+
+def run_stage(payload):
+    """Worker-side handler: returns ('ok', value) or ('error', message)."""
+    stage, arg = payload
+    try:
+        if stage == 'parse':
+            try:
+                expr = parse_expr(arg)
+            except (SyntaxError, TokenError):
+                # Their str() is a tuple repr, not a message
+                return 'error', f'Could not parse {arg!r}'
+            return 'ok', (sp.srepr(expr), str(expr))
+        expr = _from_srepr(arg)
+        if stage == 'simplify':
+            simplified = sp.simplify(expr)
+            return 'ok', (str(simplified), simplified != expr)
+        if stage == 'expand':
+            if not hasattr(expr, 'expand'):
+                return 'ok', (str(expr), False)
+            expanded = expr.expand()
+            return 'ok', (str(expanded), expanded != expr)
+        if stage == 'evalf':
+            return 'ok', str(expr.evalf())
+        return 'error', f'Unknown stage {stage}'
+    except Exception as e:
+        return 'error', str(e) or type(e).__name__
+
+
+def _json_number(value):
+    if isinstance(value, complex):
+        return str(value)
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def _float_or_none(text):
+    try:
+        value = float(text)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def _json_values(value):
+    array = np.asarray(value)
+    if np.iscomplexobj(array):
+        array = array.astype(complex)
+        if not array.imag.any():
+            array = array.real
+    if array.ndim == 0:
+        return _json_number(array.item())
+    return [_json_number(v) for v in array.ravel().tolist()]
+
+
+def run_vectorized(payload):
+    """Worker-side handler: evaluate many expressions in one NumPy pass.
+
+    payload is (sreprs, bindings) where bindings maps symbol names to lists
+    of values. Returns one entry per expression: ('ok', value),
+    ('symbolic', None) when it has unbound symbols, or ('error', message).
+    """
+    keys, bindings = payload
+    names = sorted(bindings)
+    symbols = [sp.Symbol(name) for name in names]
+    arrays = [np.asarray(bindings[name], dtype=float) for name in names]
+    results = [None] * len(keys)
+    numeric = []
+    try:
+        for index, key in enumerate(keys):
+            expr = _from_srepr(key)
+            if {str(symbol) for symbol in expr.free_symbols} <= set(names):
+                numeric.append((index, expr))
+            else:
+                results[index] = ('symbolic', None)
+    except Exception as e:
+        return [('error', str(e) or type(e).__name__)] * len(keys)
+
+    def evaluate(exprs):
+        function = sp.lambdify(symbols, exprs, modules='numpy')
+        with np.errstate(all='ignore'):
+            return function(*arrays)
+
+    try:
+        values = evaluate([expr for _, expr in numeric])
+        for (index, _), value in zip(numeric, values):
+            results[index] = ('ok', _json_values(value))
+    except Exception:
+        # One unsupported expression spoils the shared pass; isolate it
+        for index, expr in numeric:
+            try:
+                results[index] = ('ok', _json_values(evaluate(expr)))
+            except Exception as e:
+                results[index] = ('error', str(e) or type(e).__name__)
+    return results
+
+
+def run_task(payload):
+    """Worker entry point for the math pool."""
+    if payload[0] == 'vectorize':
+        return run_vectorized(payload[1])
+    return run_stage(payload)
+
+
+def _binding_values(name, spec):
+    if isinstance(spec, dict):
+        start = float(spec.get('start', 0))
+        stop = float(spec['stop'])
+        if 'num' in spec:
+            num = int(spec['num'])
+            if num < 1 or num > MATH_BATCH_MAX_POINTS:
+                raise MathError(f'num for {name} must be between 1 and {MATH_BATCH_MAX_POINTS}')
+            return np.linspace(start, stop, num).tolist()
+        step = float(spec.get('step', 1))
+        if step <= 0 or (stop - start) / step > MATH_BATCH_MAX_POINTS:
+            raise MathError(f'Range for {name} is empty or too large')
+        return np.arange(start, stop, step).tolist()
+    if isinstance(spec, (list, tuple)):
+        return [float(v) for v in spec]
+    return [float(spec)]
+
+
+def expand_bindings(variables):
+    """Turn {'x': [..]} or {'x': {'start', 'stop', 'num'|'step'}} into lists."""
+    if variables is None:
+        return {}
+    if not isinstance(variables, dict):
+        raise MathError('variables must be an object mapping names to values or ranges')
+    bindings = {}
+    for name, spec in variables.items():
+        if not str(name).isidentifier():
+            raise MathError(f'Invalid variable name {name!r}')
+        try:
+            values = _binding_values(name, spec)
+        except KeyError as e:
+            raise MathError(f'Range for {name} is missing {e.args[0]!r}')
+        except (TypeError, ValueError, OverflowError):
+            raise MathError(f'Values for {name} must be numbers or a start/stop/num|step range')
+        if len(values) > MATH_BATCH_MAX_POINTS:
+            raise MathError(f'Too many values for {name} (max {MATH_BATCH_MAX_POINTS})')
+        bindings[str(name)] = values
+    lengths = {len(v) for v in bindings.values() if len(v) != 1}
+    if len(lengths) > 1:
+        raise MathError('Variable ranges must have the same length')
+    return bindings
+
+
+# Sentinel for a stage that ran out of budget
+TIMED_OUT = object()
+
+
+class MathSolver:
+    def __init__(self, workers=MATH_WORKERS, memory_mb=MATH_MEMORY_MB, budgets=None):
+        self.budgets = dict(STAGE_BUDGETS, **(budgets or {}))
+        self.pool = WorkerPool(
+            run_task, workers,
+            cpu_seconds=int(max(self.budgets.values())) + 1,
+            memory_mb=memory_mb
+        )
+        # problem text -> (srepr, str) and srepr -> solved result
+        self.parsed = ResponseCache(max_entries=MATH_CACHE_SIZE, ttl=MATH_CACHE_TTL)
+        self.results = ResponseCache(max_entries=MATH_CACHE_SIZE, ttl=MATH_CACHE_TTL)
+
+    def _stage(self, stage, arg):
+        try:
+            status, value = self.pool.call((stage, arg), self.budgets[stage])
+        except (WorkerTimeout, WorkerLimitExceeded):
+            return TIMED_OUT
+        if status == 'error':
+            raise MathError(value)
+        return value
+
+    def parse(self, problem):
+        """Return (srepr, str) for problem, memoized on the raw text."""
+        parsed = self.parsed.get(problem)
+        if parsed is None:
+            parsed = self._stage('parse', problem)
+            if parsed is TIMED_OUT:
+                raise MathError('Parsing took too long')
+            self.parsed.set(problem, parsed)
+        return parsed
+
+    def solve(self, problem):
+        key, text = self.parse(problem)
+        cached = self.results.get(key)
+        if cached is not None:
+            return dict(cached, problem=problem, partial=False, timed_out=[], cached=True)
+
+        steps = []
+        timed_out = []
+        for stage, label in (('simplify', 'Simplified'), ('expand', 'Expanded')):
+            try:
+                outcome = self._stage(stage, key)
+            except MathError:
+                # Steps are best effort, as before
+                continue
+            if outcome is TIMED_OUT:
+                timed_out.append(stage)
+            elif outcome[1]:
+                steps.append(f"{label}: {outcome[0]}")
+
+        result = self._stage('evalf', key)
+        if result is TIMED_OUT:
+            timed_out.append('evalf')
+            result = text
+
+        solved = {'result': result, 'steps': steps}
+        if not timed_out:
+            self.results.set(key, solved)
+        return dict(solved, problem=problem, partial=bool(timed_out),
+                    timed_out=timed_out, cached=False)
+
+    def solve_batch(self, problems, variables=None):
+        """Solve many problems in one call.
+
+        Duplicate problems are solved once. Numeric items, and items whose
+        symbols are all bound in variables, are evaluated together in one
+        vectorized pass; everything else goes through solve().
+
+        Every item that evaluates to a number carries it in 'value' (a list
+        when variables are bound). 'result' is always text in solve()'s
+        format and is omitted only for bound, list-valued items.
+        """
+        if len(problems) > MATH_BATCH_MAX_PROBLEMS:
+            raise MathError(f'At most {MATH_BATCH_MAX_PROBLEMS} problems per batch')
+        if np is None and variables:
+            raise MathError('Variable bindings require NumPy')
+        bindings = expand_bindings(variables) if np is not None else {}
+
+        unique = list(dict.fromkeys(problems))
+        solved = {}
+        keys = {}
+        for problem in unique:
+            try:
+                keys[problem] = self.parse(problem)[0]
+            except MathError as e:
+                solved[problem] = {'problem': problem, 'error': str(e)}
+
+        # Distinct expressions, e.g. '1+1' and '1 + 1', share one slot
+        distinct = list(dict.fromkeys(keys.values()))
+        outcomes = {}
+        if distinct and np is not None:
+            try:
+                status, value = 'ok', self.pool.call(('vectorize', (distinct, bindings)),
+                                                      self.budgets['vectorize'])
+            except (WorkerTimeout, WorkerLimitExceeded):
+                status, value = 'timeout', None
+            if status == 'ok':
+                outcomes = dict(zip(distinct, value))
+
+        for problem, key in keys.items():
+            outcome = outcomes.get(key)
+            # Unbound non-finite values (oo, zoo, nan) are left to sympy
+            if outcome is not None and outcome[0] == 'ok' and (bindings or outcome[1] is not None):
+                item = {'problem': problem, 'value': outcome[1], 'method': 'vectorized'}
+                if isinstance(outcome[1], float):
+                    item['result'] = str(sp.Float(outcome[1]))
+                elif isinstance(outcome[1], str):
+                    item['result'] = str(sp.sympify(complex(outcome[1])).evalf())
+                solved[problem] = item
+            elif outcome is not None and outcome[0] == 'error' and bindings:
+                solved[problem] = {'problem': problem, 'error': outcome[1]}
+            else:
+                try:
+                    item = dict(self.solve(problem), method='symbolic')
+                    value = _float_or_none(item['result'])
+                    if value is not None:
+                        item['value'] = value
+                    solved[problem] = item
+                except MathError as e:
+                    solved[problem] = {'problem': problem, 'error': str(e)}
+
+        return [solved[problem] for problem in problems]
+
+    def stats(self):
+        return {'parsed': self.parsed.stats(), 'results': self.results.stats()}
+
+
+_solver = None
+_solver_lock = threading.Lock()
+
+
+def get_solver():
+    global _solver
+    with _solver_lock:
+        if _solver is None:
+            _solver = MathSolver()
+        return _solver
@@ -0,0 +1,264 @@
+"""
+Versioned schema migrations for raiden.db.
+
+Applied versions are recorded in the schema_migrations table. At startup
+migrate() runs every pending migration in order, each inside its own
+transaction. To change the schema, append a new (version, name, function)
+entry to MIGRATIONS; never edit one that has already shipped.
+"""
+
+from datetime import datetime
+
+
+def _columns(db, table):
+    return {row[1] for row in db.execute(f'PRAGMA table_info({table})')}
+
+
+def create_tables(db):
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task TEXT NOT NULL,
+            due_date TEXT NOT NULL,
+            priority INTEGER DEFAULT 2,
+            completed BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS flashcards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            front TEXT NOT NULL,
+            back TEXT NOT NULL,
+            category TEXT DEFAULT 'General',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS attendance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_name TEXT NOT NULL,
+            date TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            status TEXT NOT NULL,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def reconcile_legacy_columns(db):
+    """Bring databases created from the old schema.sql up to date."""
+    tasks = _columns(db, 'tasks')
+    if 'priority' not in tasks:
+        db.execute('ALTER TABLE tasks ADD COLUMN priority INTEGER DEFAULT 2')
+
+    flashcards = _columns(db, 'flashcards')
+    if 'question' in flashcards and 'front' not in flashcards:
+        db.execute('ALTER TABLE flashcards RENAME COLUMN question TO front')
+    if 'answer' in flashcards and 'back' not in flashcards:
+        db.execute('ALTER TABLE flashcards RENAME COLUMN answer TO back')
+    if 'category' not in flashcards:
+        db.execute("ALTER TABLE flashcards ADD COLUMN category TEXT DEFAULT 'General'")
+
+    # The old attendance table had no student/subject and UNIQUE(date),
+    # which only a rebuild can remove
+    attendance = _columns(db, 'attendance')
+    if 'student_name' not in attendance or 'subject' not in attendance:
+        db.execute('ALTER TABLE attendance RENAME TO attendance_legacy')
+        create_tables(db)
+        db.execute("""
+            INSERT INTO attendance (id, student_name, date, subject, status, notes, created_at)
+            SELECT id, '', date, '', status, notes, created_at FROM attendance_legacy
+        """)
+        db.execute('DROP TABLE attendance_legacy')
+
+
+def add_list_indexes(db):
+    # Each index matches the ORDER BY (and leading filter) of a list route
+    db.execute('CREATE INDEX IF NOT EXISTS idx_flashcards_created_at ON flashcards(created_at, id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_flashcards_category ON flashcards(category, created_at, id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks(due_date, id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks(completed, due_date, id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance(date, id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_attendance_student ON attendance(student_name, date, id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_attendance_subject ON attendance(subject, date, id)')
+
+
+# Adds (or, with sign -1, removes) one attendance row to its summary bucket
+_SUMMARY_DELTA = """
+    INSERT OR IGNORE INTO attendance_summary (student_name, subject, month)
+    VALUES ({row}.student_name, {row}.subject, substr({row}.date, 1, 7));
+    UPDATE attendance_summary SET
+        present = present + {sign} * (lower({row}.status) = 'present'),
+        absent = absent + {sign} * (lower({row}.status) = 'absent'),
+        late = late + {sign} * (lower({row}.status) = 'late'),
+        total = total + {sign}
+    WHERE student_name = {row}.student_name AND subject = {row}.subject
+        AND month = substr({row}.date, 1, 7);
+"""
+
+_SUMMARY_PRUNE = """
+    DELETE FROM attendance_summary
+    WHERE student_name = OLD.student_name AND subject = OLD.subject
+        AND month = substr(OLD.date, 1, 7) AND total <= 0;
+"""
+
+
+def add_attendance_summary(db):
+    """Per student, subject and month status counts, kept current by triggers."""
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS attendance_summary (
+            student_name TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            month TEXT NOT NULL,
+            present INTEGER NOT NULL DEFAULT 0,
+            absent INTEGER NOT NULL DEFAULT 0,
+            late INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (student_name, subject, month)
+        ) WITHOUT ROWID
+    """)
+    db.execute('CREATE INDEX IF NOT EXISTS idx_attendance_summary_subject ON attendance_summary(subject, month)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_attendance_summary_month ON attendance_summary(month)')
+
+    db.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS attendance_summary_insert AFTER INSERT ON attendance
+        BEGIN {_SUMMARY_DELTA.format(row='NEW', sign=1)} END
+    """)
+    db.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS attendance_summary_delete AFTER DELETE ON attendance
+        BEGIN {_SUMMARY_DELTA.format(row='OLD', sign=-1)} {_SUMMARY_PRUNE} END
+    """)
+    db.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS attendance_summary_update
+        AFTER UPDATE OF student_name, subject, date, status ON attendance
+        BEGIN
+            {_SUMMARY_DELTA.format(row='OLD', sign=-1)} {_SUMMARY_PRUNE}
+            {_SUMMARY_DELTA.format(row='NEW', sign=1)}
+        END
+    """)
+
+    # Backfill from the rows that existed before the triggers
+    db.execute('DELETE FROM attendance_summary')
+    db.execute("""
+        INSERT INTO attendance_summary (student_name, subject, month, present, absent, late, total)
+        SELECT student_name, subject, substr(date, 1, 7),
+               SUM(lower(status) = 'present'), SUM(lower(status) = 'absent'),
+               SUM(lower(status) = 'late'), COUNT(*)
+        FROM attendance
+        GROUP BY student_name, subject, substr(date, 1, 7)
+    """)
+
+
+def add_flashcard_search(db):
+    """FTS5 index over flashcards, kept in sync with the table by triggers."""
+    # External content table: the text lives only in flashcards, the index
+    # stores tokens. prefix='2 3' adds prefix indexes for short query stems.
+    db.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS flashcards_fts USING fts5(
+            front, back, category,
+            content='flashcards', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    """)
+    db.execute("""
+        CREATE TRIGGER IF NOT EXISTS flashcards_fts_insert AFTER INSERT ON flashcards BEGIN
+            INSERT INTO flashcards_fts (rowid, front, back, category)
+            VALUES (NEW.id, NEW.front, NEW.back, NEW.category);
+        END
+    """)
+    db.execute("""
+        CREATE TRIGGER IF NOT EXISTS flashcards_fts_delete AFTER DELETE ON flashcards BEGIN
+            INSERT INTO flashcards_fts (flashcards_fts, rowid, front, back, category)
+            VALUES ('delete', OLD.id, OLD.front, OLD.back, OLD.category);
+        END
+    """)
+    db.execute("""
+        CREATE TRIGGER IF NOT EXISTS flashcards_fts_update AFTER UPDATE OF front, back, category ON flashcards BEGIN
+            INSERT INTO flashcards_fts (flashcards_fts, rowid, front, back, category)
+            VALUES ('delete', OLD.id, OLD.front, OLD.back, OLD.category);
+            INSERT INTO flashcards_fts (rowid, front, back, category)
+            VALUES (NEW.id, NEW.front, NEW.back, NEW.category);
+        END
+    """)
+    db.execute("INSERT INTO flashcards_fts (flashcards_fts) VALUES ('rebuild')")
+
+
+def add_review_schedule(db):
+    """SM-2 review state per flashcard (see spaced_repetition.py)."""
+    columns = _columns(db, 'flashcards')
+    for column, definition in (
+        ('ease', 'REAL DEFAULT 2.5'),
+        ('interval', 'INTEGER DEFAULT 0'),
+        ('repetitions', 'INTEGER DEFAULT 0'),
+        ('next_due', 'TEXT'),
+        ('last_reviewed', 'TEXT'),
+    ):
+        if column not in columns:
+            db.execute(f'ALTER TABLE flashcards ADD COLUMN {column} {definition}')
+
+    # ADD COLUMN cannot default to the insert time, so new cards get it here
+    db.execute("""
+        CREATE TRIGGER IF NOT EXISTS flashcards_next_due AFTER INSERT ON flashcards
+        WHEN NEW.next_due IS NULL BEGIN
+            UPDATE flashcards SET next_due = COALESCE(NEW.created_at, CURRENT_TIMESTAMP)
+            WHERE id = NEW.id;
+        END
+    """)
+    db.execute('UPDATE flashcards SET next_due = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE next_due IS NULL')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_flashcards_next_due ON flashcards(next_due, id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_flashcards_category_due ON flashcards(category, next_due, id)')
+
+
+MIGRATIONS = [
+    (1, 'create tables', create_tables),
+    (2, 'reconcile legacy columns', reconcile_legacy_columns),
+    (3, 'list indexes', add_list_indexes),
+    (4, 'attendance summary', add_attendance_summary),
+    (5, 'flashcard search', add_flashcard_search),
+    (6, 'flashcard review schedule', add_review_schedule),
+]
+
+
+def current_version(db):
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    """)
+    db.commit()
+    row = db.execute('SELECT MAX(version) FROM schema_migrations').fetchone()
+    return row[0] or 0
+
+
+def migrate(db):
+    """Apply pending migrations in order; returns the list of versions applied."""
+    applied = []
+    version = current_version(db)
+    for number, name, apply in MIGRATIONS:
+        if number <= version:
+            continue
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            # Another process may have migrated while we waited for the lock
+            done = db.execute(
+                'SELECT 1 FROM schema_migrations WHERE version = ?', (number,)
+            ).fetchone()
+            if not done:
+                apply(db)
+                db.execute(
+                    'INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)',
+                    (number, name, datetime.utcnow().isoformat())
+                )
+                applied.append(number)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    if applied:
+        db.execute('ANALYZE')
+        db.commit()
+    return applied
@@ -0,0 +1,269 @@
+"""
+PDF text extraction with a content-hash keyed cache.
+
+Uploads are keyed by the SHA-256 of their bytes so re-uploading the same
+file skips parsing entirely. Extraction stops as soon as the requested
+character budget is reached instead of walking every page.
+
+PyPDF2 is pure Python and CPU-bound, so parsing runs in a process pool
+rather than in the request thread. Large documents are split into page
+ranges that are extracted in parallel, under a hard page and time limit;
+each job enforces its own deadline inside the worker, so one slow upload
+never disturbs other requests sharing the pool.
+"""
+
+import hashlib
+import io
+import os
+import signal
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import PyPDF2
+
+PDF_CACHE_SIZE = int(os.getenv('PDF_CACHE_SIZE', '128'))
+# 0 disables the process pool and extracts in the calling thread
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', str(min(4, os.cpu_count() or 1))))
+PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', '500'))
+PDF_EXTRACT_TIMEOUT = float(os.getenv('PDF_EXTRACT_TIMEOUT', '60'))
+# Pages handled by one worker task
+PDF_PAGES_PER_TASK = int(os.getenv('PDF_PAGES_PER_TASK', '25'))
+
+
+class PdfExtractionTimeout(Exception):
+    """Raised when extraction exceeds PDF_EXTRACT_TIMEOUT."""
+
+
+class ExtractedText:
+    def __init__(self, text, pages_read, page_count):
+        self.text = text
+        self.pages_read = pages_read
+        self.page_count = page_count
+
+    @property
+    def complete(self):
+        # Pages past PDF_MAX_PAGES are never read, so stopping there is complete
+        return self.pages_read >= min(self.page_count, PDF_MAX_PAGES)
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def extract_pages(data, max_chars=None, start=0, stop=None):
+    """Extract text from pages [start, stop), stopping once max_chars is reached."""
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    page_count = len(reader.pages)
+    stop = page_count if stop is None else min(stop, page_count)
+    parts = []
+    total = 0
+    pages_read = 0
+    for index in range(start, stop):
+        page_text = reader.pages[index].extract_text() or ''
+        parts.append(page_text)
+        total += len(page_text)
+        pages_read += 1
+        if max_chars is not None and total >= max_chars:
+            break
+    return ExtractedText(''.join(parts), start + pages_read, page_count)
+
+
+def _deadline_passed(signum, frame):
+    raise PdfExtractionTimeout('PDF extraction deadline passed')
+
+
+def _extract_range(data, start, stop, max_chars, deadline=None):
+    # Runs in a worker process; return plain values so they pickle cheaply.
+    # The job aborts itself at its deadline, so a runaway parse frees its
+    # worker without touching the rest of the shared pool.
+    timer = deadline is not None and hasattr(signal, 'setitimer')
+    if timer:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise PdfExtractionTimeout('PDF extraction deadline passed')
+        previous = signal.signal(signal.SIGALRM, _deadline_passed)
+        signal.setitimer(signal.ITIMER_REAL, remaining)
+    try:
+        extracted = extract_pages(data, max_chars, start, stop)
+    finally:
+        if timer:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    return extracted.text, extracted.pages_read, extracted.page_count
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+        return _pool
+
+
+def _replace_pool(broken):
+    """Drop a pool whose worker died; the next get_pool() starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _ranges(first, last):
+    return [(start, min(start + PDF_PAGES_PER_TASK, last))
+            for start in range(first, last, PDF_PAGES_PER_TASK)]
+
+
+def _estimate_pages(text, pages_read, max_chars):
+    """Pages still needed to reach max_chars at the density seen so far."""
+    if not text:
+        return None
+    per_page = len(text) / pages_read
+    # A quarter more than the estimate, so uneven pages rarely need a second round
+    return int((max_chars - len(text)) / per_page * 1.25) + 1
+
+
+def _cancel(futures):
+    for future in futures:
+        future.cancel()
+
+
+def _extract_with_pool(pool, data, max_chars, page_limit, timeout):
+    deadline = time.monotonic() + timeout
+    wall_deadline = time.time() + timeout
+
+    def result(future):
+        try:
+            return future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            raise PdfExtractionTimeout(f'PDF extraction exceeded {timeout:g}s')
+
+    first_stop = min(PDF_PAGES_PER_TASK, page_limit)
+    text, pages_read, page_count = result(
+        pool.submit(_extract_range, data, 0, first_stop, max_chars, wall_deadline)
+    )
+    last_page = min(page_count, page_limit)
+    parts = [text]
+    total = len(text)
+
+    # Only the pages the character budget is estimated to need are
+    # submitted; another round follows if they fall short
+    while pages_read < last_page and (max_chars is None or total < max_chars):
+        stop = last_page
+        if max_chars is not None:
+            needed = _estimate_pages(''.join(parts), pages_read, max_chars)
+            if needed is not None:
+                stop = min(last_page, pages_read + needed)
+        futures = [pool.submit(_extract_range, data, start, end, None, wall_deadline)
+                   for start, end in _ranges(pages_read, stop)]
+        try:
+            for index, future in enumerate(futures):
+                range_text, range_read, _ = result(future)
+                parts.append(range_text)
+                total += len(range_text)
+                pages_read = range_read
+                if max_chars is not None and total >= max_chars:
+                    _cancel(futures[index + 1:])
+                    break
+        except BaseException:
+            # Queued ranges are dropped; running ones stop at the deadline
+            _cancel(futures)
+            raise
+
+    text = ''.join(parts)
+    if max_chars is not None:
+        text = text[:max_chars]
+    return ExtractedText(text, pages_read, page_count)
+
+
+def extract_in_pool(data, max_chars=None, page_limit=PDF_MAX_PAGES, timeout=PDF_EXTRACT_TIMEOUT):
+    """Extract text in worker processes.
+
+    The first range is parsed on its own since most uploads meet the
+    character budget there. If not, the pages the budget still needs
+    (estimated from the first range's characters per page, up to
+    page_limit) are fanned out across the pool and joined back in page
+    order. If a worker died (OOM kill, parser crash) the pool is replaced
+    and the extraction retried once.
+    """
+    if PDF_WORKERS <= 0:
+        return extract_pages(data, max_chars, 0, page_limit)
+
+    pool = get_pool()
+    try:
+        return _extract_with_pool(pool, data, max_chars, page_limit, timeout)
+    except BrokenProcessPool:
+        _replace_pool(pool)
+    pool = get_pool()
+    try:
+        return _extract_with_pool(pool, data, max_chars, page_limit, timeout)
+    except BrokenProcessPool:
+        _replace_pool(pool)
+        raise
+
+
+class ExtractionCache:
+    def __init__(self, max_entries=PDF_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest, max_chars=None):
+        """Return a cached extraction that covers max_chars, if any."""
+        with self._lock:
+            entry = self._entries.get(digest)
+            usable = entry is not None and (
+                entry.complete or (max_chars is not None and len(entry.text) >= max_chars)
+            )
+            if usable:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def set(self, digest, extracted):
+        with self._lock:
+            current = self._entries.get(digest)
+            # Keep whichever extraction covers more of the document
+            if current is None or extracted.pages_read >= current.pages_read:
+                self._entries[digest] = extracted
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+extraction_cache = ExtractionCache()
+
+
+def extract_text(data, max_chars=None):
+    """Return extracted text for PDF bytes, using the cache when possible."""
+    digest = content_hash(data)
+    cached = extraction_cache.get(digest, max_chars)
+    if cached is None:
+        cached = extract_in_pool(data, max_chars)
+        extraction_cache.set(digest, cached)
+    if max_chars is None:
+        return cached.text
+    return cached.text[:max_chars]
@@ -0,0 +1,186 @@
+"""
+Opt-in profiling of live requests.
+
+Both surfaces are off unless ADMIN_TOKEN is set, and every use requires
+that token in an X-Admin-Token (or Authorization: Bearer) header.
+
+- Per request: send X-Profile: 1 (or ?_profile=1) with the token and that
+  request runs under cProfile. The response carries an X-Profile-Id
+  header; the profile is kept in memory and can be downloaded as a pstats
+  file or a text report.
+- Sampling: with PROFILE_SAMPLE_HZ > 0 a background thread periodically
+  captures the stack of every thread that is serving a request and counts
+  identical stacks per route. The counts are exported in folded-stack
+  format, ready for flamegraph.pl or speedscope.
+
+Both only see the web process. Work done in the sandbox/math worker pools
+or the PDF process pool shows up as time spent waiting on those pools;
+set PDF_WORKERS=0 to profile PDF parsing inline.
+"""
+
+import cProfile
+import hmac
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, Counter
+
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+PROFILE_MAX_STORED = int(os.getenv('PROFILE_MAX_STORED', '50'))
+PROFILE_SAMPLE_HZ = float(os.getenv('PROFILE_SAMPLE_HZ', '0'))
+PROFILE_MAX_STACKS = int(os.getenv('PROFILE_MAX_STACKS', '10000'))
+PROFILE_MAX_DEPTH = int(os.getenv('PROFILE_MAX_DEPTH', '64'))
+
+# profile id -> {'meta': {...}, 'stats': pstats-compatible dict}
+_profiles = OrderedDict()
+_profiles_lock = threading.Lock()
+
+# thread ident -> route currently being served on that thread
+_active = {}
+# (route, folded stack) -> sample count
+_samples = Counter()
+_samples_lock = threading.Lock()
+_sampler = None
+
+
+def authorized(request):
+    if not ADMIN_TOKEN:
+        return False
+    token = request.headers.get('X-Admin-Token', '')
+    auth = request.headers.get('Authorization', '')
+    if not token and auth.startswith('Bearer '):
+        token = auth[len('Bearer '):]
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+def wants_profile(request):
+    flag = request.headers.get('X-Profile') or request.args.get('_profile')
+    return flag in ('1', 'true', 'yes') and authorized(request)
+
+
+def store_profile(profile_id, profiler, meta):
+    profiler.create_stats()
+    with _profiles_lock:
+        _profiles[profile_id] = {'meta': dict(meta, id=profile_id), 'stats': profiler.stats}
+        while len(_profiles) > PROFILE_MAX_STORED:
+            _profiles.popitem(last=False)
+
+
+def list_profiles():
+    with _profiles_lock:
+        return [entry['meta'] for entry in reversed(_profiles.values())]
+
+
+def get_profile(profile_id):
+    with _profiles_lock:
+        return _profiles.get(profile_id)
+
+
+def profile_bytes(entry):
+    """Serialize like pstats.Stats.dump_stats, so pstats/snakeviz can load it."""
+    return marshal.dumps(entry['stats'])
+
+
+def profile_text(entry, sort='cumulative', limit=50):
+    stream = io.StringIO()
+    stats = pstats.Stats(stream=stream)
+    stats.stats = entry['stats']
+    stats.get_top_level_stats()
+    stats.sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+def _fold(frame):
+    names = []
+    while frame is not None and len(names) < PROFILE_MAX_DEPTH:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def _sample_loop(interval):
+    me = threading.get_ident()
+    while True:
+        time.sleep(interval)
+        active = dict(_active)
+        if not active:
+            continue
+        frames = sys._current_frames()
+        with _samples_lock:
+            for ident, route in active.items():
+                frame = frames.get(ident)
+                if frame is None or ident == me:
+                    continue
+                key = (route, _fold(frame))
+                if key in _samples or len(_samples) < PROFILE_MAX_STACKS:
+                    _samples[key] += 1
+
+
+def start_sampler(hz=PROFILE_SAMPLE_HZ):
+    global _sampler
+    if hz <= 0 or _sampler is not None:
+        return
+    _sampler = threading.Thread(target=_sample_loop, args=(1.0 / hz,), daemon=True,
+                                name='profile-sampler')
+    _sampler.start()
+
+
+def folded_samples(route=None):
+    """Samples as 'route;frame;frame count' lines."""
+    with _samples_lock:
+        items = sorted(_samples.items(), key=lambda item: -item[1])
+    return ''.join(
+        f'{r};{stack} {count}\n' for (r, stack), count in items if route is None or r == route
+    )
+
+
+def reset_samples():
+    with _samples_lock:
+        _samples.clear()
+
+
+def init_app(app):
+    """Install the per-request profiling hooks and start the sampler if enabled."""
+    from flask import g, request
+
+    @app.before_request
+    def start_profile():
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        if _sampler is not None:
+            _active[threading.get_ident()] = route
+        if wants_profile(request):
+            g._profiler = cProfile.Profile()
+            g._profile_started = time.perf_counter()
+            g._profiler.enable()
+
+    @app.after_request
+    def add_profile_id(response):
+        profiler = g.get('_profiler')
+        if profiler is not None:
+            # Reserve the id now so it can be returned; stats are filled at teardown
+            g._profile_id = uuid.uuid4().hex[:12]
+            response.headers['X-Profile-Id'] = g._profile_id
+        return response
+
+    @app.teardown_request
+    def finish_profile(exception):
+        _active.pop(threading.get_ident(), None)
+        profiler = g.pop('_profiler', None)
+        if profiler is None:
+            return
+        profiler.disable()
+        store_profile(g.pop('_profile_id', None) or uuid.uuid4().hex[:12], profiler, {
+            'method': request.method,
+            'path': request.path,
+            'route': request.url_rule.rule if request.url_rule else 'unmatched',
+            'duration_ms': round((time.perf_counter() - g.pop('_profile_started')) * 1000, 2),
+            'created_at': time.time(),
+        })
+
+    start_sampler()
@@ -0,0 +1,378 @@
+"""
+Pooled, resource-limited worker processes for the code playground.
+
+User code runs in pre-forked worker processes instead of the web process.
+Workers clear the inherited environment and close inherited sockets and
+files before taking work, and code that reaches for dunder attributes or
+frames, directly or through format string fields, is rejected at compile
+time. Each run gets its own output buffer, a CPU-time budget (RLIMIT_CPU),
+an address-space cap (RLIMIT_AS) and a wall-clock timeout. A worker that hits
+a limit is killed and replaced; healthy workers are reused so a run does
+not pay interpreter startup, and are recycled after SANDBOX_MAX_RUNS.
+
+Students resubmit the same snippet constantly, so each worker caches
+compiled code objects by source hash and the pool caches the output of
+deterministic runs.
+"""
+
+import hashlib
+import io
+import multiprocessing
+import os
+import queue
+import re
+import stat
+import sys
+import threading
+from collections import OrderedDict
+
+from llm_cache import ResponseCache
+
+try:
+    import resource
+except ImportError:  # Windows: wall-clock timeout only
+    resource = None
+
+SANDBOX_WORKERS = int(os.getenv('SANDBOX_WORKERS', '2'))
+SANDBOX_TIMEOUT = float(os.getenv('SANDBOX_TIMEOUT', '5'))
+SANDBOX_CPU_SECONDS = int(os.getenv('SANDBOX_CPU_SECONDS', '5'))
+SANDBOX_MEMORY_MB = int(os.getenv('SANDBOX_MEMORY_MB', '256'))
+SANDBOX_MAX_RUNS = int(os.getenv('SANDBOX_MAX_RUNS', '100'))
+SANDBOX_MAX_OUTPUT = int(os.getenv('SANDBOX_MAX_OUTPUT', '65536'))
+SANDBOX_QUEUE_TIMEOUT = float(os.getenv('SANDBOX_QUEUE_TIMEOUT', '10'))
+SANDBOX_COMPILE_CACHE_SIZE = int(os.getenv('SANDBOX_COMPILE_CACHE_SIZE', '256'))
+SANDBOX_RESULT_CACHE_SIZE = int(os.getenv('SANDBOX_RESULT_CACHE_SIZE', '512'))
+SANDBOX_RESULT_CACHE_TTL = float(os.getenv('SANDBOX_RESULT_CACHE_TTL', '3600'))
+
+# Output of code touching these names may differ between runs
+NONDETERMINISTIC_NAMES = {'input', 'id', 'hash', 'open', 'random', 'time', 'datetime', '__import__'}
+
+SAFE_BUILTINS = {
+    'print': print,
+    'len': len,
+    'str': str,
+    'int': int,
+    'float': float,
+    'list': list,
+    'dict': dict,
+    'tuple': tuple,
+    'set': set,
+    'range': range,
+    'enumerate': enumerate,
+    'zip': zip,
+    'map': map,
+    'filter': filter,
+    'sum': sum,
+    'max': max,
+    'min': min,
+    'abs': abs,
+    'round': round,
+    'sorted': sorted,
+    'reversed': reversed,
+    'any': any,
+    'all': all,
+    'bin': bin,
+    'hex': hex,
+    'oct': oct,
+    'chr': chr,
+    'ord': ord,
+    'isinstance': isinstance,
+    'type': type,
+}
+
+# Attributes that lead from ordinary objects back to frames, modules and
+# function globals; dunder names are refused as well
+BLOCKED_NAMES = {
+    'gi_frame', 'gi_code', 'gi_yieldfrom', 'cr_frame', 'cr_code', 'cr_await',
+    'ag_frame', 'ag_code', 'ag_await',
+    'f_back', 'f_globals', 'f_locals', 'f_builtins', 'f_code', 'tb_frame', 'tb_next',
+}
+
+# A str.format / format_map field that walks a dunder attribute or indexes,
+# e.g. '{0.__class__}' or '{0[x]}'
+FORMAT_FIELD = re.compile(r'\{[^{}]*(\.__|\[)[^{}]*\}')
+
+
+class SandboxBusyError(Exception):
+    """Raised when no worker becomes free within the queue timeout."""
+
+
+def _address_space_bytes():
+    # A forked worker inherits the web process's mappings, so the memory
+    # cap is applied on top of what is already mapped
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+
+def _set_cpu_budget(seconds):
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime)
+    hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+    soft = used + seconds + 1
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def source_hash(code):
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+
+def _names(code_object):
+    names = set(code_object.co_names)
+    for const in code_object.co_consts:
+        if hasattr(const, 'co_names'):
+            names |= _names(const)
+    return names
+
+
+def _strings(consts):
+    for const in consts:
+        if isinstance(const, str):
+            yield const
+        elif isinstance(const, (tuple, frozenset)):
+            yield from _strings(const)
+        elif hasattr(const, 'co_consts'):
+            yield from _strings(const.co_consts)
+
+
+# Per-worker cache: source hash -> (code object, deterministic)
+_compiled = OrderedDict()
+
+
+def compile_cached(code):
+    """Return (code object, deterministic, cache status) for source."""
+    key = source_hash(code)
+    entry = _compiled.get(key)
+    if entry is not None:
+        _compiled.move_to_end(key)
+        return entry + ('hit',)
+    code_object = compile(code, '<playground>', 'exec')
+    names = _names(code_object)
+    blocked = sorted(n for n in names if n.startswith('__') or n in BLOCKED_NAMES)
+    if blocked:
+        raise SyntaxError(f"'{blocked[0]}' is not allowed in the playground")
+    for const in _strings(code_object.co_consts):
+        field = FORMAT_FIELD.search(const)
+        if field:
+            raise SyntaxError(f"Format field '{field.group()}' is not allowed in the playground")
+    entry = (code_object, not (names & NONDETERMINISTIC_NAMES))
+    _compiled[key] = entry
+    while len(_compiled) > SANDBOX_COMPILE_CACHE_SIZE:
+        _compiled.popitem(last=False)
+    return entry + ('miss',)
+
+
+def execute(code):
+    """Run code with the restricted builtins and capture its output."""
+    try:
+        code_object, deterministic, compile_status = compile_cached(code)
+    except SyntaxError as e:
+        return {'output': '', 'error': str(e), 'cacheable': True, 'compile_cache': 'miss'}
+
+    captured = io.StringIO()
+    old_stdout = sys.stdout
+    sys.stdout = captured
+    error = None
+    try:
+        exec(code_object, {'__builtins__': dict(SAFE_BUILTINS)})
+    except MemoryError:
+        error = 'Memory limit exceeded'
+        deterministic = False
+    except BaseException as e:
+        error = str(e) or type(e).__name__
+    finally:
+        sys.stdout = old_stdout
+    output = captured.getvalue()
+    if len(output) > SANDBOX_MAX_OUTPUT:
+        output = output[:SANDBOX_MAX_OUTPUT] + '\n... output truncated'
+    return {'output': output, 'error': error, 'cacheable': deterministic,
+            'compile_cache': compile_status}
+
+
+def _open_fds():
+    try:
+        return [int(fd) for fd in os.listdir('/proc/self/fd')]
+    except OSError:
+        return range(3, min(os.sysconf('SC_OPEN_MAX'), 4096))
+
+
+def _isolate(keep_fd):
+    """Drop what the worker inherited from the web process by forking.
+
+    The environment holds API keys, and inherited sockets and files include
+    client connections and the SQLite database. Pipes are kept since
+    multiprocessing uses them to watch the worker's lifetime.
+    """
+    os.environ.clear()
+    for fd in _open_fds():
+        if fd <= 2 or fd == keep_fd:
+            continue
+        try:
+            mode = os.fstat(fd).st_mode
+        except OSError:
+            continue
+        if stat.S_ISSOCK(mode) or stat.S_ISREG(mode) or stat.S_ISDIR(mode):
+            os.close(fd)
+
+
+def _worker_main(conn, handler, memory_bytes, cpu_seconds):
+    _isolate(conn.fileno())
+    if resource is not None and memory_bytes:
+        limit = _address_space_bytes() + memory_bytes
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    while True:
+        try:
+            payload = conn.recv()
+        except (EOFError, OSError):
+            break
+        if resource is not None:
+            _set_cpu_budget(cpu_seconds)
+        conn.send(handler(payload))
+
+
+class _Worker:
+    def __init__(self, context, handler, memory_bytes, cpu_seconds):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, handler, memory_bytes, cpu_seconds),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.runs = 0
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+
+class WorkerTimeout(Exception):
+    """The worker did not answer within the wall-clock timeout."""
+
+
+class WorkerLimitExceeded(Exception):
+    """The worker was killed by its CPU or memory rlimit."""
+
+
+class WorkerPool:
+    """Fixed pool of reusable worker processes running handler(payload).
+
+    handler must never raise; it runs in the worker and its return value is
+    sent back to the caller.
+    """
+
+    def __init__(self, handler, size, cpu_seconds, memory_mb, max_runs=SANDBOX_MAX_RUNS,
+                 queue_timeout=SANDBOX_QUEUE_TIMEOUT):
+        self.handler = handler
+        self.size = size
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_mb * 1024 * 1024
+        self.max_runs = max_runs
+        self.queue_timeout = queue_timeout
+        self._context = multiprocessing.get_context('fork' if resource is not None else None)
+        self._idle = queue.Queue()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def _spawn(self):
+        return _Worker(self._context, self.handler, self.memory_bytes, self.cpu_seconds)
+
+    def start(self):
+        with self._lock:
+            if not self._started:
+                for _ in range(self.size):
+                    self._idle.put(self._spawn())
+                self._started = True
+
+    def call(self, payload, timeout):
+        """Run handler(payload) in a worker, killing it if it overruns."""
+        self.start()
+        try:
+            worker = self._idle.get(timeout=self.queue_timeout)
+        except queue.Empty:
+            raise SandboxBusyError('All workers are busy, please retry shortly')
+
+        healthy = False
+        try:
+            worker.conn.send(payload)
+            if not worker.conn.poll(timeout):
+                raise WorkerTimeout(f'timed out after {timeout:g}s')
+            try:
+                result = worker.conn.recv()
+            except (EOFError, OSError):
+                raise WorkerLimitExceeded('CPU or memory limit exceeded')
+            healthy = True
+            return result
+        finally:
+            worker.runs += 1
+            if healthy and worker.runs < self.max_runs:
+                self._idle.put(worker)
+            else:
+                worker.kill()
+                self._idle.put(self._spawn())
+
+    def shutdown(self):
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                break
+
+
+class SandboxPool(WorkerPool):
+    def __init__(self, size=SANDBOX_WORKERS, timeout=SANDBOX_TIMEOUT,
+                 cpu_seconds=SANDBOX_CPU_SECONDS, memory_mb=SANDBOX_MEMORY_MB,
+                 max_runs=SANDBOX_MAX_RUNS, queue_timeout=SANDBOX_QUEUE_TIMEOUT):
+        super().__init__(execute, size, cpu_seconds, memory_mb, max_runs, queue_timeout)
+        self.timeout = timeout
+        self.results = ResponseCache(
+            max_entries=SANDBOX_RESULT_CACHE_SIZE, ttl=SANDBOX_RESULT_CACHE_TTL
+        )
+
+    def run(self, code, timeout=None):
+        """Run code in a pooled worker and return {'output', 'error', 'cache'}.
+
+        cache is 'hit' when the output came from the result cache, 'miss'
+        when the run was cached for next time and 'skip' when it was not
+        cacheable (nondeterministic names, timeouts, resource limits).
+        """
+        key = source_hash(code)
+        cached = self.results.get(key)
+        if cached is not None:
+            return dict(cached, cache='hit')
+
+        result = self._execute(code, timeout)
+        if result.pop('cacheable', False):
+            self.results.set(key, {'output': result['output'], 'error': result['error']})
+            result['cache'] = 'miss'
+        else:
+            result['cache'] = 'skip'
+        return result
+
+    def _execute(self, code, timeout=None):
+        timeout = timeout or self.timeout
+        try:
+            return self.call(code, timeout)
+        except WorkerTimeout:
+            return {'output': '', 'error': f'Execution timed out after {timeout:g}s'}
+        except (WorkerLimitExceeded, OSError):
+            return {'output': '', 'error': 'Execution stopped: CPU or memory limit exceeded'}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool()
+        return _pool
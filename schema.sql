@@ -1,15 +1,68 @@
+-- Reference copy of the current raiden.db schema.
+-- The live schema is created and upgraded by migrations.py at startup.
+
 CREATE TABLE IF NOT EXISTS tasks (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     task TEXT NOT NULL,
     due_date TEXT NOT NULL,
     priority INTEGER DEFAULT 2,
     completed BOOLEAN DEFAULT FALSE,
-    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE TABLE IF NOT EXISTS flashcards (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
-    question TEXT NOT NULL,
-    answer TEXT NOT NULL,
-    created_at TEXT DEFAULT CURRENT_TIMESTAMP
-);
\ No newline at end of file
+    front TEXT NOT NULL,
+    back TEXT NOT NULL,
+    category TEXT DEFAULT 'General',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    ease REAL DEFAULT 2.5,
+    interval INTEGER DEFAULT 0,
+    repetitions INTEGER DEFAULT 0,
+    next_due TEXT,
+    last_reviewed TEXT
+);
+
+CREATE TABLE IF NOT EXISTS attendance (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_name TEXT NOT NULL,
+    date TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    status TEXT NOT NULL,
+    notes TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_flashcards_created_at ON flashcards(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_flashcards_category ON flashcards(category, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_flashcards_next_due ON flashcards(next_due, id);
+CREATE INDEX IF NOT EXISTS idx_flashcards_category_due ON flashcards(category, next_due, id);
+CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks(due_date, id);
+CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks(completed, due_date, id);
+CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance(date, id);
+CREATE INDEX IF NOT EXISTS idx_attendance_student ON attendance(student_name, date, id);
+CREATE INDEX IF NOT EXISTS idx_attendance_subject ON attendance(subject, date, id);
+
+-- Per student, subject and month status counts for /attendance/stats.
+-- Maintained by triggers on attendance (see migrations.add_attendance_summary).
+CREATE TABLE IF NOT EXISTS attendance_summary (
+    student_name TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    month TEXT NOT NULL,
+    present INTEGER NOT NULL DEFAULT 0,
+    absent INTEGER NOT NULL DEFAULT 0,
+    late INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (student_name, subject, month)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_attendance_summary_subject ON attendance_summary(subject, month);
+CREATE INDEX IF NOT EXISTS idx_attendance_summary_month ON attendance_summary(month);
+
+-- Full-text index for /flashcards/search, synced by triggers on flashcards
+-- (see migrations.add_flashcard_search).
+CREATE VIRTUAL TABLE IF NOT EXISTS flashcards_fts USING fts5(
+    front, back, category,
+    content='flashcards', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
@@ -1,95 +1,82 @@
-from flask import Flask, request, jsonify, send_from_directory, render_template, g, make_response
+from flask import Flask, request, jsonify, send_from_directory, render_template, g, make_response, Response, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 import os
+import re
 import datetime
 import json
-from groq import Groq
-import sympy as sp
-from sympy.parsing.sympy_parser import parse_expr
-import PyPDF2
+from groq_client import get_manager, GroqBusyError
+from llm_cache import ResponseCache, LLM_CACHE_PERSIST
+from math_engine import get_solver as get_math_solver, MathError
+from pdf_extract import extract_text, extraction_cache, PdfExtractionTimeout
+from summarizer import summarize_document
+from sandbox import get_pool as get_sandbox_pool, SandboxBusyError
 from datetime import datetime, timedelta
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from apscheduler.schedulers.background import BackgroundScheduler
-import sqlite3
-from contextlib import closing
+import attendance
+import database
+import migrations
+import profiling
+import spaced_repetition
+import telemetry
+import upstream
+import web_search
 import uuid
 import io
+import html
 import csv
-import requests
-from bs4 import BeautifulSoup
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
-CORS(app)
+CORS(app, expose_headers=['X-Next-Cursor', 'X-Cache', 'X-Profile-Id'])
 socketio = SocketIO(app, cors_allowed_origins="*")
 
+# Request metrics and logging (see telemetry.py)
+telemetry.configure_logging()
+telemetry.init_app(app)
+logger = telemetry.logger
+# Opt-in cProfile and stack sampling for live requests (see profiling.py)
+profiling.init_app(app)
+
 # API Keys
 GNEWS_API_KEY = os.getenv('GNEWS_API_KEY')
 OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY')
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 
-# Database configuration
-DATABASE = 'raiden.db'
+# Upper bound on PDF text fed to the map-reduce summarizer
+PDF_SUMMARY_CHARS = int(os.getenv('PDF_SUMMARY_MAX_CHARS', '200000'))
+
+# Database configuration (pooled per-thread connections, see database.py)
+DATABASE = database.DATABASE
 
 def get_db():
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
-        db.row_factory = sqlite3.Row
+        db = g._database = database.get_connection(DATABASE)
     return db
 
 def init_db():
+    # Create tables and apply pending schema migrations (see migrations.py)
     with app.app_context():
-        with closing(get_db()) as db:
-            # Create tasks table if not exists
-            db.execute("""
-                CREATE TABLE IF NOT EXISTS tasks (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    task TEXT NOT NULL,
-                    due_date TEXT NOT NULL,
-                    completed BOOLEAN DEFAULT FALSE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Create flashcards table
-            db.execute("""
-                CREATE TABLE IF NOT EXISTS flashcards (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    front TEXT NOT NULL,
-                    back TEXT NOT NULL,
-                    category TEXT DEFAULT 'General',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Create attendance table
-            db.execute("""
-                CREATE TABLE IF NOT EXISTS attendance (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    student_name TEXT NOT NULL,
-                    date TEXT NOT NULL,
-                    subject TEXT NOT NULL,
-                    status TEXT NOT NULL,
-                    notes TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            db.commit()
+        migrations.migrate(get_db())
 
 @app.teardown_appcontext
 def close_db(exception):
-    db = getattr(g, '_database', None)
-    if db is not None:
-        db.close()
+    # The connection stays open for reuse; just drop any unfinished transaction
+    if getattr(g, '_database', None) is not None:
+        database.release_connection(DATABASE)
+
+# Cache for repeated LLM prompts (persistent tier is opt-in via LLM_CACHE_PERSIST=1)
+llm_response_cache = ResponseCache(db_path=DATABASE if LLM_CACHE_PERSIST else None)
 
-# Initialize Groq client
+# Shared Groq client (keep-alive pool, concurrency limit, retries)
 def get_groq_client():
     if not GROQ_API_KEY:
         return None
-    return Groq(api_key=GROQ_API_KEY)
+    return get_manager(GROQ_API_KEY, cache=llm_response_cache)
 
 # Main route
 @app.route('/')
@@ -107,17 +94,106 @@ def chat():
         if not client:
             return jsonify({'error': 'Groq API key not configured'}), 500
         
-        response = client.chat.completions.create(
-            model="llama3-8b-8192",
+        response = client.complete(
             messages=[{"role": "user", "content": message}],
             temperature=0.7,
             max_tokens=1000
         )
         
-        return jsonify({'response': response.choices[0].message.content})
+        return jsonify({'response': response})
+    except GroqBusyError as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def sse_event(data, event=None):
+    payload = f"data: {json.dumps(data)}\n\n"
+    if event:
+        payload = f"event: {event}\n" + payload
+    return payload
+
+# Streaming chat endpoint (Server-Sent Events)
+@app.route('/chat/stream', methods=['GET', 'POST'])
+def chat_stream():
+    if request.method == 'POST':
+        message = (request.json or {}).get('message', '')
+    else:
+        message = request.args.get('message', '')
+
+    client = get_groq_client()
+    if not client:
+        return jsonify({'error': 'Groq API key not configured'}), 500
+
+    def generate():
+        tokens = client.stream(messages=[{"role": "user", "content": message}])
+        try:
+            for token in tokens:
+                yield sse_event({'token': token})
+            yield sse_event({'done': True}, event='done')
+        except Exception as e:
+            yield sse_event({'error': str(e)}, event='error')
+        finally:
+            # Also runs when the client disconnects mid-stream
+            tokens.close()
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# Cache statistics
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify({
+        'llm': llm_response_cache.stats(),
+        'pdf_extraction': extraction_cache.stats(),
+        'code_results': get_sandbox_pool().results.stats(),
+        'math': get_math_solver().stats(),
+        'upstream': upstream.cache.stats()
+    })
+
+# Prometheus metrics
+telemetry.register_cache('llm', llm_response_cache.stats)
+telemetry.register_cache('pdf_extraction', extraction_cache.stats)
+telemetry.register_cache('code_results', lambda: get_sandbox_pool().results.stats())
+telemetry.register_cache('math_results', lambda: get_math_solver().results.stats())
+telemetry.register_cache('upstream', upstream.cache.stats)
+
+@app.route('/metrics')
+def metrics():
+    return Response(telemetry.render(), mimetype='text/plain; version=0.0.4')
+
+# Profiling downloads (require the ADMIN_TOKEN)
+@app.route('/admin/profiles', methods=['GET'])
+def list_profiles():
+    if not profiling.authorized(request):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify(profiling.list_profiles())
+
+@app.route('/admin/profiles/samples', methods=['GET', 'DELETE'])
+def profile_samples():
+    if not profiling.authorized(request):
+        return jsonify({'error': 'Unauthorized'}), 401
+    if request.method == 'DELETE':
+        profiling.reset_samples()
+        return jsonify({'message': 'Samples cleared'})
+    return Response(profiling.folded_samples(request.args.get('route')), mimetype='text/plain')
+
+@app.route('/admin/profiles/<profile_id>', methods=['GET'])
+def download_profile(profile_id):
+    if not profiling.authorized(request):
+        return jsonify({'error': 'Unauthorized'}), 401
+    entry = profiling.get_profile(profile_id)
+    if entry is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    # ?format=text for a readable report, otherwise a pstats file
+    if request.args.get('format') == 'text':
+        return Response(profiling.profile_text(entry, request.args.get('sort', 'cumulative')),
+                        mimetype='text/plain')
+    response = Response(profiling.profile_bytes(entry), mimetype='application/octet-stream')
+    response.headers['Content-Disposition'] = f'attachment; filename={profile_id}.prof'
+    return response
+
 # Math solver endpoint
 @app.route('/solve_math', methods=['POST'])
 def solve_math():
@@ -125,36 +201,89 @@ def solve_math():
         data = request.json
         problem = data.get('problem', '')
         
-        # Parse and solve the mathematical expression
-        expr = parse_expr(problem)
-        result = expr.evalf()
+        # Parse and solve in the math worker pool (memoized, time-bounded per stage)
+        return jsonify(get_math_solver().solve(problem))
+    except MathError as e:
+        return jsonify({'error': str(e)}), 400
+    except SandboxBusyError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/solve_math/batch', methods=['POST'])
+def solve_math_batch():
+    try:
+        data = request.json or {}
+        problems = data.get('problems', [])
+        if not isinstance(problems, list):
+            return jsonify({'error': 'problems must be a list'}), 400
         
-        # Also try to get step-by-step solution
-        steps = []
-        try:
-            # Try to simplify step by step
-            simplified = sp.simplify(expr)
-            if simplified != expr:
-                steps.append(f"Simplified: {simplified}")
-            
-            # Try to expand if applicable
-            if hasattr(expr, 'expand'):
-                expanded = expr.expand()
-                if expanded != expr:
-                    steps.append(f"Expanded: {expanded}")
-                    
-        except:
-            pass
-        
-        return jsonify({
-            'result': str(result),
-            'steps': steps,
-            'problem': problem
-        })
+        results = get_math_solver().solve_batch(
+            [str(p) for p in problems], data.get('variables')
+        )
+        return jsonify({'results': results})
+    except MathError as e:
+        return jsonify({'error': str(e)}), 400
+    except SandboxBusyError as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # PDF summarization endpoint
+def summarize_pdf_bytes(client, data, progress=None):
+    # Read PDF content (cached by content hash, parsed in the worker pool)
+    text = extract_text(data, max_chars=PDF_SUMMARY_CHARS)
+    
+    # Summarize using Groq (map-reduce over the whole document)
+    summary = summarize_document(client, text, progress=progress)
+    
+    return {
+        'summary': summary,
+        'original_text': text[:500] + "..." if len(text) > 500 else text
+    }
+
+# Background summary jobs: job_id -> job state. Clients poll
+# /summarize_pdf/jobs/<job_id> or join the job's Socket.IO room.
+pdf_jobs = {}
+pdf_jobs_lock = threading.Lock()
+PDF_JOB_TTL = 3600
+# Long-running work started from a request runs on real threads: without
+# eventlet's monkey patching a Socket.IO background task is a greenlet that
+# never runs under gunicorn's sync workers and blocks the hub under
+# `python server.py`. Only the progress events go through socketio.emit.
+background_executor = ThreadPoolExecutor(max_workers=int(os.getenv('BACKGROUND_WORKERS', '8')),
+                                         thread_name_prefix='background')
+
+def update_pdf_job(job_id, **fields):
+    with pdf_jobs_lock:
+        job = pdf_jobs.get(job_id)
+        if job is None:
+            return
+        job.update(fields, updated_at=time.time())
+        snapshot = dict(job)
+    socketio.emit('pdf_job', snapshot, to=job_id)
+
+def run_pdf_job(job_id, client, data):
+    def progress(stage, done, total):
+        update_pdf_job(job_id, progress={'stage': stage, 'done': done, 'total': total})
+
+    try:
+        update_pdf_job(job_id, status='running')
+        result = summarize_pdf_bytes(client, data, progress=progress)
+        update_pdf_job(job_id, status='done', result=result)
+    except Exception as e:
+        update_pdf_job(job_id, status='error', error=str(e))
+
+def start_pdf_job(client, data):
+    now = time.time()
+    job_id = uuid.uuid4().hex
+    with pdf_jobs_lock:
+        for stale in [k for k, job in pdf_jobs.items() if now - job['updated_at'] > PDF_JOB_TTL]:
+            del pdf_jobs[stale]
+        pdf_jobs[job_id] = {'job_id': job_id, 'status': 'pending', 'updated_at': now}
+    background_executor.submit(run_pdf_job, job_id, client, data)
+    return job_id
+
 @app.route('/summarize_pdf', methods=['POST'])
 def summarize_pdf():
     try:
@@ -166,46 +295,128 @@ def summarize_pdf():
             return jsonify({'error': 'No file selected'}), 400
         
         if file and file.filename.lower().endswith('.pdf'):
-            # Read PDF content
-            pdf_reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text()
-            
-            # Summarize using Groq
             client = get_groq_client()
             if not client:
                 return jsonify({'error': 'Groq API key not configured'}), 500
             
-            prompt = f"Please summarize the following text in 3-5 key points:\n\n{text[:3000]}"
+            data = file.read()
             
-            response = client.chat.completions.create(
-                model="llama3-8b-8192",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=500
-            )
+            # ?async=1 returns a job handle immediately instead of blocking
+            if request.args.get('async') == '1' or request.form.get('async') == '1':
+                job_id = start_pdf_job(client, data)
+                return jsonify({
+                    'job_id': job_id,
+                    'status_url': f'/summarize_pdf/jobs/{job_id}'
+                }), 202
             
-            return jsonify({
-                'summary': response.choices[0].message.content,
-                'original_text': text[:500] + "..." if len(text) > 500 else text
-            })
+            # Progress is pushed to the caller's Socket.IO session when it sends one
+            socket_id = request.form.get('socket_id')
+            progress = None
+            if socket_id:
+                def progress(stage, done, total):
+                    socketio.emit('summary_progress',
+                                  {'stage': stage, 'done': done, 'total': total},
+                                  to=socket_id)
+            
+            return jsonify(summarize_pdf_bytes(client, data, progress=progress))
         else:
             return jsonify({'error': 'Invalid file type. Please upload a PDF file.'}), 400
             
+    except PdfExtractionTimeout as e:
+        return jsonify({'error': str(e)}), 504
+    except GroqBusyError as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/summarize_pdf/jobs/<job_id>', methods=['GET'])
+def get_pdf_job(job_id):
+    with pdf_jobs_lock:
+        job = pdf_jobs.get(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(dict(job))
+
+# List endpoints share keyset pagination: ?limit=&cursor= pages through the
+# results (next cursor in the X-Next-Cursor header) and ?fields= projects columns
+MAX_PAGE_SIZE = 500
+STREAM_BATCH_SIZE = 500
+TASK_PERIOD_DAYS = {'today': 1, 'week': 7, 'month': 31}
+# Largest operation list accepted by the /batch endpoints
+MAX_BATCH_OPERATIONS = int(os.getenv('MAX_BATCH_OPERATIONS', '1000'))
+
+def page_args():
+    fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()]
+    limit = request.args.get('limit', type=int)
+    if limit is not None:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+    return fields or None, limit, request.args.get('cursor')
+
+def stream_list(batches, ndjson):
+    # Encode batch by batch so the full result is never held in memory
+    if ndjson:
+        for batch in batches:
+            yield ''.join(json.dumps(row) + '\n' for row in batch)
+        return
+    yield '['
+    first = True
+    for batch in batches:
+        chunk = ','.join(json.dumps(row) for row in batch)
+        yield chunk if first else ',' + chunk
+        first = False
+    yield ']'
+
+def list_response(table, sort_column, descending, where, params):
+    fields, limit, cursor = page_args()
+    
+    # ?stream=json streams a JSON array, ?stream=ndjson one object per line
+    stream = request.args.get('stream')
+    if stream in ('json', 'ndjson'):
+        batches = database.iter_keyset(
+            get_db(), table, sort_column, descending, where, params,
+            fields=fields, limit=limit, cursor=cursor, batch_size=STREAM_BATCH_SIZE
+        )
+        mimetype = 'application/x-ndjson' if stream == 'ndjson' else 'application/json'
+        return Response(stream_with_context(stream_list(batches, stream == 'ndjson')),
+                        mimetype=mimetype)
+    
+    rows, next_cursor = database.keyset_page(
+        get_db(), table, sort_column, descending, where, params,
+        fields=fields, limit=limit, cursor=cursor
+    )
+    response = jsonify(rows)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+def batch_response(table, defaults, required):
+    # Body is {"operations": [...]} or the bare list; see database.bulk_write
+    data = request.json
+    operations = data.get('operations') if isinstance(data, dict) else data
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'operations must be a non-empty list'}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({'error': f'At most {MAX_BATCH_OPERATIONS} operations per batch'}), 400
+    
+    results = database.bulk_write(get_db(), table, operations, defaults, required)
+    failed = sum(1 for result in results if 'error' in result)
+    # Nothing applied means the request as a whole was unusable
+    status = 400 if failed == len(results) else 200
+    return jsonify({'results': results, 'applied': len(results) - failed, 'failed': failed}), status
+
 # Flashcards endpoints
 @app.route('/flashcards', methods=['GET'])
 def get_flashcards():
     try:
-        with closing(get_db()) as db:
-            flashcards = db.execute(
-                'SELECT * FROM flashcards ORDER BY created_at DESC'
-            ).fetchall()
-            
-            return jsonify([dict(flashcard) for flashcard in flashcards])
+        where, params = [], []
+        category = request.args.get('category')
+        if category:
+            where.append('category = ?')
+            params.append(category)
+        
+        return list_response('flashcards', 'created_at', True, where, params)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -217,23 +428,116 @@ def create_flashcard():
         back = data.get('back', '')
         category = data.get('category', 'General')
         
-        with closing(get_db()) as db:
-            db.execute(
-                'INSERT INTO flashcards (front, back, category) VALUES (?, ?, ?)',
-                (front, back, category)
-            )
-            db.commit()
+        db = get_db()
+        db.execute(
+            'INSERT INTO flashcards (front, back, category) VALUES (?, ?, ?)',
+            (front, back, category)
+        )
+        db.commit()
             
         return jsonify({'message': 'Flashcard created successfully'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Relative BM25 weights of the front, back and category columns
+FLASHCARD_SEARCH_WEIGHTS = (10.0, 5.0, 1.0)
+FLASHCARD_SEARCH_LIMIT = 20
+# Private-use characters mark matches in snippet(); the text is HTML-escaped
+# first and only then are the markers turned into <mark> tags
+MATCH_START, MATCH_END = '\ue000', '\ue001'
+
+def highlight(snippet):
+    escaped = html.escape(snippet or '')
+    return escaped.replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>')
+
+def fts_query(text):
+    # Quote every term so FTS5 operators in user input are matched literally,
+    # and make each one a prefix match for search-as-you-type
+    terms = re.findall(r'\w+', text)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+@app.route('/flashcards/search', methods=['GET'])
+def search_flashcards():
+    try:
+        query = fts_query(request.args.get('q', ''))
+        if not query:
+            return jsonify({'error': 'q must contain at least one word'}), 400
+        limit = request.args.get('limit', FLASHCARD_SEARCH_LIMIT, type=int)
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        
+        sql = '''
+            SELECT f.id, f.front, f.back, f.category,
+                   snippet(flashcards_fts, -1, ?, ?, '…', 12) AS snippet,
+                   bm25(flashcards_fts, ?, ?, ?) AS score
+            FROM flashcards_fts
+            JOIN flashcards f ON f.id = flashcards_fts.rowid
+            WHERE flashcards_fts MATCH ?
+        '''
+        params = [MATCH_START, MATCH_END] + list(FLASHCARD_SEARCH_WEIGHTS) + [query]
+        category = request.args.get('category')
+        if category:
+            sql += ' AND f.category = ?'
+            params.append(category)
+        # bm25() is lower for better matches
+        sql += ' ORDER BY score LIMIT ?'
+        params.append(limit)
+        
+        rows = get_db().execute(sql, params).fetchall()
+        return jsonify([dict(row, snippet=highlight(row['snippet']), score=round(-row['score'], 4))
+                        for row in rows])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Spaced-repetition review queue (see spaced_repetition.py)
+@app.route('/flashcards/due', methods=['GET'])
+def get_due_flashcards():
+    try:
+        where = ['next_due <= ?']
+        params = [spaced_repetition.timestamp(datetime.utcnow())]
+        category = request.args.get('category')
+        if category:
+            where.append('category = ?')
+            params.append(category)
+        
+        return list_response('flashcards', 'next_due', False, where, params)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/flashcards/<int:card_id>/review', methods=['POST'])
+def review_flashcard(card_id):
+    try:
+        data = request.json or {}
+        try:
+            quality = int(data['quality'])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': 'quality (0-5) is required'}), 400
+        
+        state = spaced_repetition.record_review(get_db(), card_id, quality)
+        if state is None:
+            return jsonify({'error': 'Flashcard not found'}), 404
+        return jsonify(state)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/flashcards/batch', methods=['POST'])
+def batch_flashcards():
+    try:
+        return batch_response(
+            'flashcards', {'front': '', 'back': '', 'category': 'General'}, ('front', 'back')
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/flashcards/<int:card_id>', methods=['DELETE'])
 def delete_flashcard(card_id):
     try:
-        with closing(get_db()) as db:
-            db.execute('DELETE FROM flashcards WHERE id = ?', (card_id,))
-            db.commit()
+        db = get_db()
+        db.execute('DELETE FROM flashcards WHERE id = ?', (card_id,))
+        db.commit()
             
         return jsonify({'message': 'Flashcard deleted successfully'})
     except Exception as e:
@@ -243,12 +547,31 @@ def delete_flashcard(card_id):
 @app.route('/study_planner/tasks', methods=['GET'])
 def get_tasks():
     try:
-        with closing(get_db()) as db:
-            tasks = db.execute(
-                'SELECT * FROM tasks ORDER BY due_date ASC'
-            ).fetchall()
-            
-            return jsonify([dict(task) for task in tasks])
+        where, params = [], []
+        completed = request.args.get('completed')
+        if completed is not None:
+            where.append('completed = ?')
+            params.append(completed.lower() in ('1', 'true', 'yes'))
+        
+        # ?period=today|week|month is a due-date window starting today
+        due_from = request.args.get('due_from')
+        due_to = request.args.get('due_to')
+        period = request.args.get('period')
+        if period in TASK_PERIOD_DAYS:
+            today = datetime.now().date()
+            due_from = today.isoformat()
+            due_to = (today + timedelta(days=TASK_PERIOD_DAYS[period])).isoformat()
+        if due_from:
+            where.append('due_date >= ?')
+            params.append(due_from)
+        if due_to:
+            # Exclusive bound so date-time values on the last day still match
+            where.append('due_date < ?')
+            params.append(due_to)
+        
+        return list_response('tasks', 'due_date', False, where, params)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -259,29 +582,39 @@ def create_task():
         task = data.get('task', '')
         due_date = data.get('due_date', '')
         
-        with closing(get_db()) as db:
-            db.execute(
-                'INSERT INTO tasks (task, due_date) VALUES (?, ?)',
-                (task, due_date)
-            )
-            db.commit()
+        db = get_db()
+        db.execute(
+            'INSERT INTO tasks (task, due_date) VALUES (?, ?)',
+            (task, due_date)
+        )
+        db.commit()
             
         return jsonify({'message': 'Task created successfully'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/study_planner/tasks/batch', methods=['POST'])
+def batch_tasks():
+    try:
+        return batch_response(
+            'tasks', {'task': '', 'due_date': '', 'priority': 2, 'completed': False},
+            ('task', 'due_date')
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/study_planner/tasks/<int:task_id>', methods=['PUT'])
 def update_task(task_id):
     try:
         data = request.json
         completed = data.get('completed', False)
         
-        with closing(get_db()) as db:
-            db.execute(
-                'UPDATE tasks SET completed = ? WHERE id = ?',
-                (completed, task_id)
-            )
-            db.commit()
+        db = get_db()
+        db.execute(
+            'UPDATE tasks SET completed = ? WHERE id = ?',
+            (completed, task_id)
+        )
+        db.commit()
             
         return jsonify({'message': 'Task updated successfully'})
     except Exception as e:
@@ -290,32 +623,31 @@ def update_task(task_id):
 @app.route('/study_planner/tasks/<int:task_id>', methods=['DELETE'])
 def delete_task(task_id):
     try:
-        with closing(get_db()) as db:
-            db.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
-            db.commit()
+        db = get_db()
+        db.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+        db.commit()
             
         return jsonify({'message': 'Task deleted successfully'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# News endpoint
+# News endpoint (cached per category, see upstream.py)
 @app.route('/news')
 def get_news():
     try:
         if not GNEWS_API_KEY:
             return jsonify({'error': 'News API key not configured'}), 500
         
-        url = f"https://gnews.io/api/v4/top-headlines?token={GNEWS_API_KEY}&lang=en&country=us&max=10"
-        response = requests.get(url)
-        
-        if response.status_code == 200:
-            return jsonify(response.json())
-        else:
-            return jsonify({'error': 'Failed to fetch news'}), 500
+        news, status = upstream.get_news(GNEWS_API_KEY, category=request.args.get('category'))
+        response = jsonify(news)
+        response.headers['X-Cache'] = status
+        return response
+    except upstream.UpstreamError:
+        return jsonify({'error': 'Failed to fetch news'}), 500
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# Weather endpoint
+# Weather endpoint (cached per city, see upstream.py)
 @app.route('/weather')
 def get_weather():
     try:
@@ -323,44 +655,123 @@ def get_weather():
             return jsonify({'error': 'Weather API key not configured'}), 500
         
         city = request.args.get('city', 'London')
-        url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={OPENWEATHER_API_KEY}&units=metric"
-        response = requests.get(url)
+        weather, status = upstream.get_weather(OPENWEATHER_API_KEY, city)
+        response = jsonify(weather)
+        response.headers['X-Cache'] = status
+        return response
+    except upstream.UpstreamError:
+        return jsonify({'error': 'Failed to fetch weather'}), 500
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Dashboard endpoint: news and weather are fetched concurrently on their own
+# pool, each with its own deadline; a source that misses it is reported as
+# timed out and the rest are still returned. Tasks and flashcards are local
+# SQLite reads and run inline, so a slow upstream can never starve them.
+# Slow upstream fetches keep running and fill the cache for next time.
+DASHBOARD_TIMEOUTS = {
+    'news': float(os.getenv('DASHBOARD_NEWS_TIMEOUT', '2')),
+    'weather': float(os.getenv('DASHBOARD_WEATHER_TIMEOUT', '2')),
+}
+DASHBOARD_LIST_LIMIT = int(os.getenv('DASHBOARD_LIST_LIMIT', '10'))
+dashboard_executor = ThreadPoolExecutor(max_workers=int(os.getenv('DASHBOARD_WORKERS', '8')),
+                                        thread_name_prefix='dashboard')
+
+def dashboard_news(args):
+    if not GNEWS_API_KEY:
+        raise RuntimeError('News API key not configured')
+    return upstream.get_news(GNEWS_API_KEY, category=args.get('category'))[0]
+
+def dashboard_weather(args):
+    if not OPENWEATHER_API_KEY:
+        raise RuntimeError('Weather API key not configured')
+    return upstream.get_weather(OPENWEATHER_API_KEY, args.get('city', 'London'))[0]
+
+def dashboard_tasks(args):
+    rows, _ = database.keyset_page(
+        get_db(), 'tasks', 'due_date', False,
+        ['completed = ?'], [False], limit=DASHBOARD_LIST_LIMIT
+    )
+    return rows
+
+def dashboard_flashcards(args):
+    db = get_db()
+    now = spaced_repetition.timestamp(datetime.utcnow())
+    due = db.execute('SELECT COUNT(*) FROM flashcards WHERE next_due <= ?', (now,)).fetchone()[0]
+    cards, _ = database.keyset_page(
+        db, 'flashcards', 'next_due', False, ['next_due <= ?'], [now],
+        fields=['id', 'front', 'back', 'category', 'next_due'], limit=DASHBOARD_LIST_LIMIT
+    )
+    return {'due': due, 'cards': cards}
+
+DASHBOARD_UPSTREAM_SOURCES = {
+    'news': dashboard_news,
+    'weather': dashboard_weather,
+}
+DASHBOARD_LOCAL_SOURCES = {
+    'tasks': dashboard_tasks,
+    'flashcards': dashboard_flashcards,
+}
+DASHBOARD_SOURCES = dict(DASHBOARD_UPSTREAM_SOURCES, **DASHBOARD_LOCAL_SOURCES)
+
+def dashboard_source_failed(result, name, status, error):
+    result[name] = None
+    result['status'][name] = status
+    result['errors'][name] = error
+
+@app.route('/dashboard')
+def get_dashboard():
+    try:
+        names = [n.strip() for n in request.args.get('sources', '').split(',') if n.strip()]
+        names = names or list(DASHBOARD_SOURCES)
+        unknown = [n for n in names if n not in DASHBOARD_SOURCES]
+        if unknown:
+            return jsonify({'error': f"Unknown source(s): {', '.join(unknown)}"}), 400
         
-        if response.status_code == 200:
-            return jsonify(response.json())
-        else:
-            return jsonify({'error': 'Failed to fetch weather'}), 500
+        args = request.args.to_dict()
+        started = time.monotonic()
+        futures = {name: dashboard_executor.submit(DASHBOARD_UPSTREAM_SOURCES[name], args)
+                   for name in names if name in DASHBOARD_UPSTREAM_SOURCES}
+        
+        result = {'status': {}, 'errors': {}}
+        # Local reads run while the upstream fetches are in flight
+        for name in names:
+            if name in DASHBOARD_LOCAL_SOURCES:
+                try:
+                    result[name] = DASHBOARD_LOCAL_SOURCES[name](args)
+                    result['status'][name] = 'ok'
+                except Exception as e:
+                    dashboard_source_failed(result, name, 'error', str(e))
+        for name, future in futures.items():
+            # Deadlines are measured from the start, so the total wait is the
+            # longest single deadline rather than their sum
+            remaining = max(0, started + DASHBOARD_TIMEOUTS[name] - time.monotonic())
+            try:
+                result[name] = future.result(timeout=remaining)
+                result['status'][name] = 'ok'
+            except FutureTimeoutError:
+                dashboard_source_failed(result, name, 'timeout',
+                                        f'No response within {DASHBOARD_TIMEOUTS[name]:g}s')
+            except Exception as e:
+                dashboard_source_failed(result, name, 'error', str(e))
+        result['elapsed_ms'] = round((time.monotonic() - started) * 1000, 1)
+        return jsonify(result)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# Web search endpoint
+# Web search endpoint (cached, see web_search.py)
 @app.route('/search-web', methods=['POST'])
 def search_web():
     try:
         data = request.json
         query = data.get('query', '')
         
-        # Simple web search using requests and BeautifulSoup
-        search_url = f"https://www.google.com/search?q={query}"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        response = requests.get(search_url, headers=headers)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Extract search results (simplified)
-        results = []
-        for result in soup.find_all('h3')[:5]:
-            title = result.get_text()
-            link = result.find_parent('a')
-            if link:
-                href = link.get('href')
-                if href and href.startswith('/url?q='):
-                    href = href.split('/url?q=')[1].split('&')[0]
-                    results.append({'title': title, 'url': href})
-        
-        return jsonify({'results': results})
+        results, status = web_search.search(query, snippets=bool(data.get('snippets')))
+        response = jsonify({'results': results})
+        response.headers['X-Cache'] = status
+        return response
+    except upstream.UpstreamError:
+        return jsonify({'error': 'Search failed'}), 502
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -372,71 +783,15 @@ def run_code():
         code = data.get('code', '')
         language = data.get('language', 'python')
         
-        # This is a simplified code runner - in production, use a proper sandbox
+        # Runs in a pooled worker process with CPU, memory and wall-clock limits
         if language == 'python':
-            try:
-                # Create a safe execution environment
-                exec_globals = {
-                    '__builtins__': {
-                        'print': print,
-                        'len': len,
-                        'str': str,
-                        'int': int,
-                        'float': float,
-                        'list': list,
-                        'dict': dict,
-                        'tuple': tuple,
-                        'set': set,
-                        'range': range,
-                        'enumerate': enumerate,
-                        'zip': zip,
-                        'map': map,
-                        'filter': filter,
-                        'sum': sum,
-                        'max': max,
-                        'min': min,
-                        'abs': abs,
-                        'round': round,
-                        'sorted': sorted,
-                        'reversed': reversed,
-                        'any': any,
-                        'all': all,
-                        'bin': bin,
-                        'hex': hex,
-                        'oct': oct,
-                        'chr': chr,
-                        'ord': ord,
-                        'isinstance': isinstance,
-                        'type': type,
-                        'hasattr': hasattr,
-                        'getattr': getattr,
-                        'setattr': setattr,
-                        'dir': dir,
-                        'vars': vars,
-                        'globals': globals,
-                        'locals': locals,
-                    }
-                }
-                
-                # Capture output
-                import sys
-                from io import StringIO
-                
-                old_stdout = sys.stdout
-                sys.stdout = captured_output = StringIO()
-                
-                exec(code, exec_globals)
-                
-                sys.stdout = old_stdout
-                output = captured_output.getvalue()
-                
-                return jsonify({'output': output, 'error': None})
-                
-            except Exception as e:
-                return jsonify({'output': '', 'error': str(e)})
+            result = get_sandbox_pool().run(code)
+            return jsonify(result)
         else:
             return jsonify({'error': f'Language {language} not supported yet'}), 400
             
+    except SandboxBusyError as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -470,15 +825,159 @@ def generate_citation():
         return jsonify({'error': str(e)}), 500
 
 # Attendance tracker endpoints
+ATTENDANCE_EXPORT_COLUMNS = ['id', 'student_name', 'date', 'subject', 'status', 'notes', 'created_at']
+ATTENDANCE_IMPORT_BATCH = 1000
+# Per-row import errors reported back to the client
+MAX_IMPORT_ERRORS = 100
+
+def attendance_date_range():
+    # ?year= and ?month= become a [date_from, date_to) range
+    date_from = request.args.get('date_from')
+    date_to = request.args.get('date_to')
+    year = request.args.get('year', type=int)
+    month = request.args.get('month', type=int)
+    if year and month:
+        if not 1 <= month <= 12:
+            raise ValueError('month must be between 1 and 12')
+        date_from = f'{year:04d}-{month:02d}-01'
+        date_to = f'{year + month // 12:04d}-{month % 12 + 1:02d}-01'
+    elif year:
+        date_from = f'{year:04d}-01-01'
+        date_to = f'{year + 1:04d}-01-01'
+    return date_from, date_to
+
+def attendance_filters():
+    where, params = [], []
+    for column in ('student_name', 'subject', 'status'):
+        value = request.args.get('student' if column == 'student_name' else column)
+        if value:
+            where.append(f'{column} = ?')
+            params.append(value)
+    
+    date_from, date_to = attendance_date_range()
+    if date_from:
+        where.append('date >= ?')
+        params.append(date_from)
+    if date_to:
+        where.append('date < ?')
+        params.append(date_to)
+    return where, params
+
 @app.route('/attendance', methods=['GET'])
 def get_attendance():
     try:
-        with closing(get_db()) as db:
-            attendance = db.execute(
-                'SELECT * FROM attendance ORDER BY date DESC'
-            ).fetchall()
-            
-            return jsonify([dict(record) for record in attendance])
+        where, params = attendance_filters()
+        return list_response('attendance', 'date', True, where, params)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def parse_attendance_row(row):
+    """Validate one CSV row; returns the insert tuple or raises ValueError."""
+    student_name = (row.get('student_name') or '').strip()
+    date = (row.get('date') or '').strip()
+    subject = (row.get('subject') or '').strip()
+    status = (row.get('status') or '').strip() or 'Present'
+    notes = (row.get('notes') or '').strip()
+    if not student_name or not subject:
+        raise ValueError('student_name and subject are required')
+    try:
+        datetime.strptime(date, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f'invalid date {date!r}, expected YYYY-MM-DD')
+    return (student_name, date, subject, status, notes)
+
+@app.route('/attendance/import', methods=['POST'])
+def import_attendance():
+    try:
+        # Accept a multipart upload or a raw text/csv body; either way the
+        # CSV is read incrementally rather than loaded whole
+        if 'file' in request.files:
+            source = request.files['file'].stream
+        else:
+            source = request.stream
+        reader = csv.DictReader(io.TextIOWrapper(source, encoding='utf-8-sig', newline=''))
+        missing = {'student_name', 'date', 'subject'} - set(reader.fieldnames or [])
+        if missing:
+            return jsonify({'error': f"Missing CSV column(s): {', '.join(sorted(missing))}"}), 400
+        
+        db = get_db()
+        imported = 0
+        skipped = 0
+        errors = []
+        batch = []
+        
+        def flush():
+            # One transaction (and one fsync) per batch
+            db.executemany(
+                'INSERT INTO attendance (student_name, date, subject, status, notes) VALUES (?, ?, ?, ?, ?)',
+                batch
+            )
+            db.commit()
+        
+        for line_number, row in enumerate(reader, start=2):
+            try:
+                batch.append(parse_attendance_row(row))
+            except ValueError as e:
+                skipped += 1
+                if len(errors) < MAX_IMPORT_ERRORS:
+                    errors.append({'line': line_number, 'error': str(e)})
+                continue
+            if len(batch) >= ATTENDANCE_IMPORT_BATCH:
+                flush()
+                imported += len(batch)
+                batch = []
+        if batch:
+            flush()
+            imported += len(batch)
+        
+        return jsonify({'imported': imported, 'skipped': skipped, 'errors': errors})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/attendance/export', methods=['GET'])
+def export_attendance():
+    try:
+        where, params = attendance_filters()
+        batches = database.iter_keyset(
+            get_db(), 'attendance', 'date', True, where, params,
+            fields=ATTENDANCE_EXPORT_COLUMNS, batch_size=STREAM_BATCH_SIZE
+        )
+        
+        def generate():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(ATTENDANCE_EXPORT_COLUMNS)
+            for batch in batches:
+                writer.writerows([row[c] for c in ATTENDANCE_EXPORT_COLUMNS] for row in batch)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+        
+        response = Response(stream_with_context(generate()), mimetype='text/csv')
+        response.headers['Content-Disposition'] = 'attachment; filename=attendance.csv'
+        return response
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/attendance/stats', methods=['GET'])
+def get_attendance_stats():
+    try:
+        date_from, date_to = attendance_date_range()
+        return jsonify(attendance.stats(
+            get_db(),
+            student=request.args.get('student'),
+            subject=request.args.get('subject'),
+            date_from=date_from,
+            date_to=date_to,
+            include_streaks=request.args.get('streaks') in ('1', 'true', 'yes')
+        ))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -492,33 +991,117 @@ def add_attendance():
         status = data.get('status', 'Present')
         notes = data.get('notes', '')
         
-        with closing(get_db()) as db:
-            db.execute(
-                'INSERT INTO attendance (student_name, date, subject, status, notes) VALUES (?, ?, ?, ?, ?)',
-                (student_name, date, subject, status, notes)
-            )
-            db.commit()
+        db = get_db()
+        db.execute(
+            'INSERT INTO attendance (student_name, date, subject, status, notes) VALUES (?, ?, ?, ?, ?)',
+            (student_name, date, subject, status, notes)
+        )
+        db.commit()
             
         return jsonify({'message': 'Attendance record added successfully'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # WebSocket events
+# sid -> threading.Event set when that client's chat stream should stop
+chat_cancel_events = {}
+chat_cancel_lock = threading.Lock()
+
 @socketio.on('connect')
 def handle_connect():
-    print('Client connected')
+    logger.info('Client connected', extra={'fields': {'sid': request.sid}})
     emit('connected', {'data': 'Connected to server'})
 
 @socketio.on('disconnect')
 def handle_disconnect():
-    print('Client disconnected')
+    logger.info('Client disconnected', extra={'fields': {'sid': request.sid}})
+    with chat_cancel_lock:
+        cancel = chat_cancel_events.pop(request.sid, None)
+    if cancel:
+        cancel.set()
+
+def run_chat_stream(sid, message, cancel):
+    client = get_groq_client()
+    if not client:
+        socketio.emit('chat_error', {'error': 'Groq API key not configured'}, to=sid)
+        return
+
+    tokens = client.stream(messages=[{"role": "user", "content": message}])
+    try:
+        for token in tokens:
+            if cancel.is_set():
+                break
+            socketio.emit('chat_token', {'token': token}, to=sid)
+        else:
+            socketio.emit('chat_done', {'done': True}, to=sid)
+    except Exception as e:
+        socketio.emit('chat_error', {'error': str(e)}, to=sid)
+    finally:
+        tokens.close()
+        # A newer message or a disconnect may have replaced or removed the entry
+        with chat_cancel_lock:
+            if chat_cancel_events.get(sid) is cancel:
+                del chat_cancel_events[sid]
+
+@socketio.on('chat')
+def handle_chat(data):
+    message = (data or {}).get('message', '')
+
+    # Only one in-flight stream per client; a new message supersedes the old one
+    cancel = threading.Event()
+    with chat_cancel_lock:
+        previous = chat_cancel_events.pop(request.sid, None)
+        chat_cancel_events[request.sid] = cancel
+    if previous:
+        previous.set()
+
+    # A real thread, so the blocking Groq stream neither stalls nor starves the server
+    background_executor.submit(run_chat_stream, request.sid, message, cancel)
+
+@socketio.on('pdf_job_subscribe')
+def handle_pdf_job_subscribe(data):
+    job_id = (data or {}).get('job_id')
+    with pdf_jobs_lock:
+        job = dict(pdf_jobs[job_id]) if job_id in pdf_jobs else None
+    if job is None:
+        emit('pdf_job', {'job_id': job_id, 'status': 'unknown'})
+        return
+    join_room(job_id)
+    emit('pdf_job', job)
+
+@socketio.on('chat_cancel')
+def handle_chat_cancel():
+    with chat_cancel_lock:
+        cancel = chat_cancel_events.pop(request.sid, None)
+    if cancel:
+        cancel.set()
 
 @socketio.on('message')
 def handle_message(data):
     emit('response', {'data': f'Echo: {data}'})
 
+# Nightly spread of the review queue so no day is overloaded
+REVIEW_SCHEDULER = os.getenv('REVIEW_SCHEDULER', '1') == '1'
+REVIEW_REBALANCE_HOUR = int(os.getenv('REVIEW_REBALANCE_HOUR', '3'))
+
+def rebalance_reviews():
+    try:
+        moved = spaced_repetition.rebalance(database.get_connection(DATABASE))
+        logger.info(f"Review rebalance: moved {moved} card(s)", extra={'fields': {'moved': moved}})
+    except Exception:
+        logger.exception('Review rebalance failed')
+
+def start_scheduler():
+    scheduler = BackgroundScheduler(daemon=True)
+    scheduler.add_job(rebalance_reviews, 'cron', hour=REVIEW_REBALANCE_HOUR, timezone='UTC',
+                      id='rebalance_reviews', coalesce=True, max_instances=1)
+    scheduler.start()
+    return scheduler
+
 # Initialize database on startup
 init_db()
+if REVIEW_SCHEDULER:
+    scheduler = start_scheduler()
 
 if __name__ == '__main__':
     print("🚀 Starting Raiden AI server...")
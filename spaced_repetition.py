@@ -0,0 +1,115 @@
+"""
+SM-2 spaced-repetition scheduling for flashcards.
+
+Every card carries its review state in the flashcards table: ease factor,
+interval in days, successful repetitions in a row and next_due, a UTC
+'YYYY-MM-DD HH:MM:SS' timestamp (the same format as created_at). New cards
+are due as soon as they are created. next_due is indexed, so today's queue
+is an index range scan and recording a review is a single-row update.
+
+A nightly job rebalances the upcoming schedule so no day holds more than
+REVIEW_MAX_PER_DAY cards; the overflow is pushed to the following day,
+mature cards (longest intervals) first.
+"""
+
+import os
+from datetime import datetime, timedelta
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+
+REVIEW_MAX_PER_DAY = int(os.getenv('REVIEW_MAX_PER_DAY', '200'))
+REVIEW_REBALANCE_DAYS = int(os.getenv('REVIEW_REBALANCE_DAYS', '30'))
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def timestamp(moment):
+    return moment.strftime(TIMESTAMP_FORMAT)
+
+
+def next_state(ease, interval, repetitions, quality):
+    """Apply one SM-2 review; quality is 0 (blackout) to 5 (perfect recall).
+
+    Returns (ease, interval in days, repetitions).
+    """
+    if not 0 <= quality <= 5:
+        raise ValueError('quality must be between 0 and 5')
+    ease = ease or DEFAULT_EASE
+    if quality < 3:
+        # Lapse: relearn from the start, ease is still adjusted below
+        repetitions = 0
+        interval = 1
+    else:
+        repetitions += 1
+        if repetitions == 1:
+            interval = 1
+        elif repetitions == 2:
+            interval = 6
+        else:
+            interval = round(interval * ease)
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    return round(ease, 4), interval, repetitions
+
+
+def record_review(db, card_id, quality, now=None):
+    """Schedule card_id after a review; returns its new state or None if missing."""
+    now = now or datetime.utcnow()
+    row = db.execute(
+        'SELECT ease, interval, repetitions FROM flashcards WHERE id = ?', (card_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    ease, interval, repetitions = next_state(
+        row['ease'], row['interval'] or 0, row['repetitions'] or 0, quality
+    )
+    state = {
+        'id': card_id,
+        'ease': ease,
+        'interval': interval,
+        'repetitions': repetitions,
+        'next_due': timestamp(now + timedelta(days=interval)),
+        'last_reviewed': timestamp(now)
+    }
+    db.execute("""
+        UPDATE flashcards SET ease = :ease, interval = :interval, repetitions = :repetitions,
+            next_due = :next_due, last_reviewed = :last_reviewed
+        WHERE id = :id
+    """, state)
+    db.commit()
+    return state
+
+
+def rebalance(db, max_per_day=REVIEW_MAX_PER_DAY, days=REVIEW_REBALANCE_DAYS, now=None):
+    """Cap the number of cards due on each of the next days.
+
+    Day 0 includes everything already overdue. Walking forward, each day's
+    excess moves to the start of the next day, where it is counted again.
+    Returns the number of moves made.
+    """
+    today = (now or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0)
+    moved = 0
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        for offset in range(days):
+            start = timestamp(today + timedelta(days=offset))
+            end = timestamp(today + timedelta(days=offset + 1))
+            lower = '' if offset == 0 else 'next_due >= :start AND '
+            window = f'{lower}next_due < :end'
+            params = {'start': start, 'end': end}
+            count = db.execute(f'SELECT COUNT(*) FROM flashcards WHERE {window}', params).fetchone()[0]
+            excess = count - max_per_day
+            if excess <= 0:
+                continue
+            db.execute(f"""
+                UPDATE flashcards SET next_due = :end WHERE id IN (
+                    SELECT id FROM flashcards WHERE {window}
+                    ORDER BY interval DESC, id DESC LIMIT :excess
+                )
+            """, dict(params, excess=excess))
+            moved += excess
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return moved
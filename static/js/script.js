@@ -1816,11 +1816,14 @@ int main() {
         }
         
         function loadAttendanceData(year, month) {
-            fetch(`/attendance?year=${year}&month=${month}`)
-                .then(response => response.json())
-                .then(data => {
-                    attendanceRecords = data.attendance;
-                    updateStats(data.stats);
+            // Rows for the calendar; counts come pre-aggregated from the server
+            Promise.all([
+                fetch(`/attendance?year=${year}&month=${month}`).then(response => response.json()),
+                fetch(`/attendance/stats?year=${year}&month=${month}`).then(response => response.json())
+            ])
+                .then(([records, stats]) => {
+                    attendanceRecords = records;
+                    updateStats(stats.overall);
                     highlightCalendarDays();
                 })
                 .catch(error => {
@@ -0,0 +1,97 @@
+"""
+Map-reduce summarization for long documents.
+
+Text is split into token-budgeted chunks, each chunk is summarized
+concurrently through a bounded thread pool, and the partial summaries are
+reduced into the final key points. Wall-clock time is bounded by the
+slowest chunk rather than the sum of all chunks.
+"""
+
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+SUMMARY_CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', '1500'))
+SUMMARY_WORKERS = int(os.getenv('SUMMARY_WORKERS', '4'))
+
+# Rough English average; good enough for budgeting prompt sizes
+CHARS_PER_TOKEN = 4
+
+MAP_PROMPT = "Summarize the following section of a document in a short paragraph, keeping key facts and terms:\n\n{text}"
+REDUCE_PROMPT = "The following are summaries of consecutive sections of one document. Combine them into 3-5 key points:\n\n{text}"
+SINGLE_PROMPT = "Please summarize the following text in 3-5 key points:\n\n{text}"
+
+_SPLIT_POINTS = re.compile(r'\n\s*\n|(?<=[.!?])\s+')
+
+
+def chunk_text(text, max_tokens=SUMMARY_CHUNK_TOKENS):
+    """Split text into chunks of at most max_tokens, preferring paragraph
+    and sentence boundaries."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks = []
+    current = []
+    size = 0
+    for piece in _SPLIT_POINTS.split(text):
+        piece = piece.strip()
+        if not piece:
+            continue
+        # Hard-split pieces that are longer than a whole chunk
+        while len(piece) > max_chars:
+            if current:
+                chunks.append(' '.join(current))
+                current, size = [], 0
+            chunks.append(piece[:max_chars])
+            piece = piece[max_chars:]
+        if size + len(piece) + 1 > max_chars and current:
+            chunks.append(' '.join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + 1
+    if current:
+        chunks.append(' '.join(current))
+    return chunks
+
+
+def _ask(client, prompt, max_tokens):
+    return client.complete(
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.7,
+        max_tokens=max_tokens
+    )
+
+
+def summarize_document(client, text, progress=None, chunk_tokens=SUMMARY_CHUNK_TOKENS,
+                       max_workers=SUMMARY_WORKERS):
+    """Summarize text of any length into 3-5 key points.
+
+    progress, if given, is called as progress(stage, done, total) while the
+    map and reduce stages run.
+    """
+    chunks = chunk_text(text, chunk_tokens)
+    if len(chunks) <= 1:
+        return _ask(client, SINGLE_PROMPT.format(text=text.strip()), 500)
+
+    # Reduce repeatedly until the partial summaries fit into a single prompt
+    stage = 'map'
+    while len(chunks) > 1:
+        summaries = [None] * len(chunks)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(_ask, client, MAP_PROMPT.format(text=chunk), 300): index
+                for index, chunk in enumerate(chunks)
+            }
+            done = 0
+            for future in as_completed(futures):
+                summaries[futures[future]] = future.result()
+                done += 1
+                if progress:
+                    progress(stage, done, len(chunks))
+        chunks = chunk_text('\n\n'.join(summaries), chunk_tokens)
+        stage = 'reduce'
+
+    if progress:
+        progress('final', 0, 1)
+    summary = _ask(client, REDUCE_PROMPT.format(text=chunks[0]), 500)
+    if progress:
+        progress('final', 1, 1)
+    return summary
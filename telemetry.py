@@ -0,0 +1,268 @@
+"""
+In-process metrics and structured logging.
+
+Request middleware records per-route latency histograms, request counts
+and in-flight gauges; upstream HTTP calls and SQLite statements report
+their durations through observe_upstream() and observe_query(); caches
+are sampled when /metrics is scraped. render() produces the Prometheus text exposition format.
+
+Metrics are per process: under several gunicorn workers each one exposes
+its own, so scrape them individually or aggregate with sum().
+
+With LOG_FORMAT=json every log record, including one access record per
+request, is written as a single JSON object per line.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+# Requests slower than this are also logged at WARNING
+SLOW_REQUEST_SECONDS = float(os.getenv('SLOW_REQUEST_SECONDS', '1'))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1)
+
+logger = logging.getLogger('raiden')
+access_logger = logging.getLogger('raiden.access')
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metric:
+    def __init__(self, name, help_text, kind, labels=()):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, '')) for label in self.labels)
+
+    def _format_labels(self, key, extra=()):
+        pairs = list(zip(self.labels, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def header(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(Metric):
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, 'counter', labels)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f'{self.name}{self._format_labels(k)} {v:g}' for k, v in items]
+
+
+class Gauge(Counter):
+    def __init__(self, name, help_text, labels=()):
+        Metric.__init__(self, name, help_text, 'gauge', labels)
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, 'histogram', labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                lines.append(f'{self.name}_bucket{self._format_labels(key, [("le", le)])} {cumulative}')
+            lines.append(f'{self.name}_sum{self._format_labels(key)} {total:.6f}')
+            lines.append(f'{self.name}_count{self._format_labels(key)} {count}')
+        return lines
+
+
+request_latency = Histogram(
+    'raiden_request_duration_seconds', 'Time to produce a response, by route.',
+    ('method', 'route', 'status')
+)
+requests_in_flight = Gauge(
+    'raiden_requests_in_flight', 'Requests currently being handled, by route.', ('route',)
+)
+upstream_latency = Histogram(
+    'raiden_upstream_duration_seconds', 'Duration of calls to external services.',
+    ('service', 'outcome')
+)
+query_latency = Histogram(
+    'raiden_sqlite_query_duration_seconds', 'SQLite statement execution time, by statement type.',
+    ('statement',), buckets=QUERY_BUCKETS
+)
+cache_hits = Gauge('raiden_cache_hits', 'Cache hits since start.', ('cache',))
+cache_misses = Gauge('raiden_cache_misses', 'Cache misses since start.', ('cache',))
+cache_hit_ratio = Gauge('raiden_cache_hit_ratio', 'Cache hits / lookups since start.', ('cache',))
+
+METRICS = [request_latency, requests_in_flight, upstream_latency, query_latency,
+           cache_hits, cache_misses, cache_hit_ratio]
+
+# name -> callable returning a stats dict with hits, misses and hit_ratio
+_cache_sources = {}
+
+
+def register_cache(name, stats):
+    _cache_sources[name] = stats
+
+
+def observe_upstream(service, seconds, outcome='ok'):
+    upstream_latency.observe(seconds, service=service, outcome=outcome)
+
+
+class timed_upstream:
+    """Context manager timing one external call; outcome is 'error' on exceptions."""
+
+    def __init__(self, service):
+        self.service = service
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe_upstream(self.service, time.perf_counter() - self.started,
+                         'ok' if exc_type is None else 'error')
+        return False
+
+
+def observe_query(sql, seconds):
+    words = sql.split(None, 1)
+    statement = words[0].upper() if words else ''
+    if statement not in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'BEGIN', 'COMMIT'):
+        statement = 'OTHER'
+    query_latency.observe(seconds, statement=statement)
+
+
+def _collect_caches():
+    for name, stats in list(_cache_sources.items()):
+        try:
+            values = stats()
+        except Exception:
+            continue
+        cache_hits.set(values.get('hits', 0), cache=name)
+        cache_misses.set(values.get('misses', 0), cache=name)
+        cache_hit_ratio.set(values.get('hit_ratio', 0.0), cache=name)
+
+
+def render():
+    _collect_caches()
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging():
+    handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    logger.handlers[:] = [handler]
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+
+def init_app(app):
+    """Install the request timing middleware on a Flask app."""
+    from flask import g, request
+
+    def route_label():
+        return request.url_rule.rule if request.url_rule else 'unmatched'
+
+    @app.before_request
+    def start_timer():
+        g._telemetry_started = time.perf_counter()
+        g._telemetry_route = route_label()
+        requests_in_flight.inc(route=g._telemetry_route)
+
+    @app.after_request
+    def record_status(response):
+        g._telemetry_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def record_request(exception):
+        started = g.pop('_telemetry_started', None)
+        if started is None:
+            return
+        # stream_with_context defers teardown until the generator finishes, so
+        # streamed responses (/chat/stream, ?stream= lists, CSV export) are
+        # measured to their last byte, including time the client takes to read
+        elapsed = time.perf_counter() - started
+        route = g.pop('_telemetry_route')
+        status = g.pop('_telemetry_status', 500)
+        requests_in_flight.dec(route=route)
+        request_latency.observe(elapsed, method=request.method, route=route, status=status)
+        fields = {
+            'method': request.method,
+            'route': route,
+            'path': request.path,
+            'status': status,
+            'duration_ms': round(elapsed * 1000, 2),
+        }
+        if exception is not None:
+            fields['error'] = str(exception)
+        if status >= 500:
+            level = logging.ERROR
+        elif elapsed >= SLOW_REQUEST_SECONDS:
+            level = logging.WARNING
+        else:
+            level = logging.INFO
+        access_logger.log(level, f"{request.method} {request.path} {status} {fields['duration_ms']}ms",
+                          extra={'fields': fields})
@@ -0,0 +1,130 @@
+"""
+Tests for schema migrations, batch writes and SM-2 scheduling
+
+Run with: python -m pytest test_migrations.py
+"""
+
+import os
+import shutil
+
+import pytest
+
+import database
+import migrations
+import spaced_repetition
+
+BASELINE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'raiden.db')
+
+FLASHCARD_DEFAULTS = {'front': '', 'back': '', 'category': 'General'}
+
+
+def columns(db, table):
+    return [row[1] for row in db.execute(f'PRAGMA table_info({table})')]
+
+
+def counts(db):
+    return {table: db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+            for table in ('flashcards', 'tasks', 'attendance')}
+
+
+def schema(db):
+    return [tuple(row) for row in db.execute('SELECT type, name, sql FROM sqlite_master ORDER BY name')]
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    """A migrated copy of the raiden.db shipped with the repository."""
+    path = str(tmp_path / 'raiden.db')
+    shutil.copy(BASELINE_DB, path)
+    db = database.connect(path)
+    if 'schema_migrations' in {row[0] for row in db.execute("SELECT name FROM sqlite_master")}:
+        db.close()
+        pytest.skip('raiden.db has already been migrated')
+    before = counts(db)
+    cards = db.execute('SELECT id, question, answer FROM flashcards ORDER BY id').fetchall()
+    applied = migrations.migrate(db)
+    yield db, before, [tuple(card) for card in cards], applied
+    db.close()
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = database.connect(str(tmp_path / 'test.db'))
+    migrations.migrate(db)
+    yield db
+    db.close()
+
+
+def test_migrate_upgrades_baseline(legacy_db):
+    db, before, cards, applied = legacy_db
+    assert applied == [number for number, _, _ in migrations.MIGRATIONS]
+    assert counts(db) == before
+    rows = db.execute('SELECT id, front, back FROM flashcards ORDER BY id').fetchall()
+    assert [tuple(row) for row in rows] == cards
+
+    assert {'front', 'back', 'category', 'ease', 'interval', 'repetitions', 'next_due'} <= set(
+        columns(db, 'flashcards'))
+    assert 'question' not in columns(db, 'flashcards')
+    assert 'priority' in columns(db, 'tasks')
+    assert {'student_name', 'subject'} <= set(columns(db, 'attendance'))
+    # Every migrated card is due and indexed for search
+    assert db.execute('SELECT COUNT(*) FROM flashcards WHERE next_due IS NULL').fetchone()[0] == 0
+    assert db.execute('SELECT COUNT(*) FROM flashcards_fts').fetchone()[0] == before['flashcards']
+
+
+def test_second_migrate_is_noop(legacy_db):
+    db, before, _, _ = legacy_db
+    snapshot = schema(db)
+    assert migrations.migrate(db) == []
+    assert schema(db) == snapshot
+    assert counts(db) == before
+
+
+def test_bulk_write_assigns_sequential_ids(db):
+    db.execute("INSERT INTO flashcards (front, back) VALUES ('a', 'b')")
+    db.execute("INSERT INTO flashcards (front, back) VALUES ('c', 'd')")
+    db.execute('DELETE FROM flashcards WHERE id = 2')
+    db.commit()
+
+    results = database.bulk_write(db, 'flashcards', [
+        {'op': 'create', 'front': 'q1', 'back': 'a1'},
+        {'op': 'create', 'front': ''},
+        {'op': 'create', 'front': 'q2', 'back': 'a2'},
+    ], FLASHCARD_DEFAULTS, ('front', 'back'))
+
+    # AUTOINCREMENT never reuses the deleted id 2; the invalid item gets no id
+    assert [result.get('id') for result in results] == [3, None, 4]
+    assert 'error' in results[1]
+    rows = db.execute('SELECT id, front, back FROM flashcards ORDER BY id').fetchall()
+    assert [tuple(row) for row in rows] == [(1, 'a', 'b'), (3, 'q1', 'a1'), (4, 'q2', 'a2')]
+
+
+def test_bulk_write_rejects_bad_values_per_item(db):
+    results = database.bulk_write(db, 'flashcards', [
+        {'op': 'create', 'front': 'q', 'back': 'a'},
+        {'op': 'create', 'front': {'x': 1}, 'back': 'a'},
+        {'op': 'update', 'id': 1, 'front': None},
+        {'op': 'update', 'id': 99, 'back': 'b'},
+    ], FLASHCARD_DEFAULTS, ('front', 'back'))
+
+    assert results[0] == {'index': 0, 'op': 'create', 'id': 1}
+    assert [('error' in result) for result in results] == [False, True, True, True]
+    assert tuple(db.execute('SELECT front, back FROM flashcards').fetchone()) == ('q', 'a')
+
+
+@pytest.mark.parametrize('state, quality, expected', [
+    ((2.5, 0, 0), 5, (2.6, 1, 1)),
+    ((2.6, 1, 1), 4, (2.6, 6, 2)),
+    ((2.6, 6, 2), 3, (2.46, 16, 3)),
+    ((2.5, 16, 3), 2, (2.18, 1, 0)),
+    ((1.3, 6, 2), 0, (1.3, 1, 0)),
+    ((None, 0, 0), 4, (2.5, 1, 1)),
+])
+def test_next_state(state, quality, expected):
+    assert spaced_repetition.next_state(*state, quality) == expected
+
+
+@pytest.mark.parametrize('quality', [-1, 6])
+def test_next_state_rejects_bad_quality(quality):
+    with pytest.raises(ValueError):
+        spaced_repetition.next_state(2.5, 1, 1, quality)
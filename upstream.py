@@ -0,0 +1,214 @@
+"""
+Cached access to the third-party services behind /news, /weather and
+/search-web.
+
+All calls share one keep-alive requests.Session with connect/read
+timeouts. Responses are cached per source and query parameters with
+stale-while-revalidate: a fresh entry is served directly, an entry past its
+TTL but inside the stale window is served immediately while one background
+refresh runs, and only a cold key waits on the network. Concurrent misses
+for the same key are coalesced so exactly one upstream request is made.
+
+Base URLs are configurable so a local stub server can stand in for GNews
+and OpenWeather.
+"""
+
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import telemetry
+
+GNEWS_BASE_URL = os.getenv('GNEWS_BASE_URL', 'https://gnews.io/api/v4')
+OPENWEATHER_BASE_URL = os.getenv('OPENWEATHER_BASE_URL', 'https://api.openweathermap.org/data/2.5')
+
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', '3'))
+UPSTREAM_READ_TIMEOUT = float(os.getenv('UPSTREAM_READ_TIMEOUT', '8'))
+UPSTREAM_POOL_SIZE = int(os.getenv('UPSTREAM_POOL_SIZE', '20'))
+UPSTREAM_STALE_TTL = float(os.getenv('UPSTREAM_STALE_TTL', '3600'))
+UPSTREAM_CACHE_SIZE = int(os.getenv('UPSTREAM_CACHE_SIZE', '256'))
+# How long a coalesced caller waits for another caller's fetch of the same key
+UPSTREAM_WAIT_TIMEOUT = float(os.getenv(
+    'UPSTREAM_WAIT_TIMEOUT', str(UPSTREAM_CONNECT_TIMEOUT + UPSTREAM_READ_TIMEOUT)
+))
+
+# Seconds an entry is fresh, per source
+SOURCE_TTLS = {
+    'news': float(os.getenv('NEWS_CACHE_TTL', '600')),
+    'weather': float(os.getenv('WEATHER_CACHE_TTL', '300')),
+    'search': float(os.getenv('SEARCH_CACHE_TTL', '900')),
+}
+
+
+class UpstreamError(Exception):
+    """The upstream answered with an error status or could not be reached."""
+
+
+def _make_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=UPSTREAM_POOL_SIZE, pool_maxsize=UPSTREAM_POOL_SIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+session = _make_session()
+
+
+def fetch_json(url, params=None, timeout=None, service='upstream'):
+    """GET url on the shared session and decode JSON, raising UpstreamError."""
+    with telemetry.timed_upstream(service):
+        try:
+            response = session.get(
+                url, params=params,
+                timeout=timeout or (UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_READ_TIMEOUT)
+            )
+        except requests.RequestException as e:
+            raise UpstreamError(str(e))
+        if response.status_code != 200:
+            raise UpstreamError(f'{url} returned {response.status_code}')
+        try:
+            return response.json()
+        except ValueError:
+            raise UpstreamError(f'{url} returned invalid JSON')
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class UpstreamCache:
+    """Stale-while-revalidate cache with single-flight loading."""
+
+    def __init__(self, ttls=None, stale_ttl=UPSTREAM_STALE_TTL, max_entries=UPSTREAM_CACHE_SIZE,
+                 wait_timeout=UPSTREAM_WAIT_TIMEOUT):
+        self.ttls = dict(SOURCE_TTLS, **(ttls or {}))
+        self.stale_ttl = stale_ttl
+        self.wait_timeout = wait_timeout
+        self.max_entries = max_entries
+        self._entries = {}
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    @staticmethod
+    def make_key(source, params):
+        return (source,) + tuple(sorted((k, str(v)) for k, v in params.items()))
+
+    def get(self, source, params, loader):
+        """Return (value, status) where status is 'hit', 'stale' or 'miss'.
+
+        loader() fetches a fresh value; it only runs on a miss or, in the
+        background, when a stale entry is served. Callers coalesced onto
+        another caller's fetch give up with UpstreamError after wait_timeout.
+        """
+        key = self.make_key(source, params)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = now - fetched_at
+                if age < self.ttls[source]:
+                    self.hits += 1
+                    return value, 'hit'
+                if age < self.ttls[source] + self.stale_ttl:
+                    self.stale_hits += 1
+                    if key not in self._flights:
+                        self._flights[key] = _Flight()
+                        self.refreshes += 1
+                        threading.Thread(
+                            target=self._load, args=(key, loader), daemon=True
+                        ).start()
+                    return value, 'stale'
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if leader:
+            self._load(key, loader)
+        elif not flight.done.wait(self.wait_timeout):
+            raise UpstreamError(f'Timed out waiting for {source} after {self.wait_timeout:g}s')
+        if flight.error is not None:
+            raise flight.error
+        return flight.value, 'miss'
+
+    def _load(self, key, loader):
+        with self._lock:
+            flight = self._flights[key]
+        try:
+            flight.value = loader()
+            with self._lock:
+                self._entries[key] = (flight.value, time.time())
+                if len(self._entries) > self.max_entries:
+                    oldest = min(self._entries, key=lambda k: self._entries[k][1])
+                    del self._entries[oldest]
+        except Exception as e:
+            # Errors are never cached; a stale entry stays servable
+            flight.error = e
+            with self._lock:
+                self.errors += 1
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses + self.coalesced
+            return {
+                'entries': len(self._entries),
+                'ttls': self.ttls,
+                'stale_ttl': self.stale_ttl,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'refreshes': self.refreshes,
+                'errors': self.errors,
+                'hit_ratio': round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0
+            }
+
+
+cache = UpstreamCache()
+
+
+def get_news(api_key, category=None, lang='en', country='us', max_articles=10):
+    params = {'lang': lang, 'country': country, 'max': max_articles}
+    if category:
+        params['category'] = category
+    return cache.get(
+        'news', params,
+        lambda: fetch_json(f'{GNEWS_BASE_URL}/top-headlines', dict(params, token=api_key),
+                           service='gnews')
+    )
+
+
+def get_weather(api_key, city):
+    params = {'q': city, 'units': 'metric'}
+    # City names differ only in case and spacing as often as not
+    key_params = dict(params, q=' '.join(city.lower().split()))
+    return cache.get(
+        'weather', key_params,
+        lambda: fetch_json(f'{OPENWEATHER_BASE_URL}/weather', dict(params, appid=api_key),
+                           service='openweather')
+    )
@@ -0,0 +1,122 @@
+"""
+Web search behind /search-web.
+
+Result pages are fetched on the shared keep-alive session from upstream.py
+and cached there under the 'search' source, keyed by the normalized query,
+so repeated searches are served from memory with single-flight loading.
+Parsing only builds the result anchors (a SoupStrainer) and uses lxml when
+it is installed. Optionally the result pages themselves are fetched in
+parallel to return their meta description as a snippet.
+"""
+
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse, parse_qs
+
+import requests
+from bs4 import BeautifulSoup, SoupStrainer
+
+import telemetry
+import upstream
+
+try:
+    import lxml  # noqa: F401
+    PARSER = 'lxml'
+except ImportError:  # Slower, but always available
+    PARSER = 'html.parser'
+
+SEARCH_BASE_URL = os.getenv('SEARCH_BASE_URL', 'https://www.google.com/search')
+SEARCH_MAX_RESULTS = int(os.getenv('SEARCH_MAX_RESULTS', '5'))
+SEARCH_SNIPPET_WORKERS = int(os.getenv('SEARCH_SNIPPET_WORKERS', '5'))
+SEARCH_SNIPPET_TIMEOUT = float(os.getenv('SEARCH_SNIPPET_TIMEOUT', '3'))
+# Descriptions live in <head>, so snippet fetches stop reading early
+SEARCH_SNIPPET_MAX_BYTES = int(os.getenv('SEARCH_SNIPPET_MAX_BYTES', '65536'))
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+# Google wraps result links as /url?q=<target>&...
+RESULT_LINKS = SoupStrainer('a', href=re.compile(r'^/url\?'))
+META_TAGS = SoupStrainer('meta')
+
+_snippet_pool = ThreadPoolExecutor(max_workers=SEARCH_SNIPPET_WORKERS,
+                                   thread_name_prefix='search-snippet')
+
+
+def normalize_query(query):
+    return ' '.join(query.lower().split())
+
+
+def _get(url, params=None, timeout=None, max_bytes=None, service='search'):
+    with telemetry.timed_upstream(service):
+        try:
+            response = upstream.session.get(
+                url, params=params, headers=HEADERS, stream=max_bytes is not None,
+                timeout=timeout or (upstream.UPSTREAM_CONNECT_TIMEOUT, upstream.UPSTREAM_READ_TIMEOUT)
+            )
+        except requests.RequestException as e:
+            raise upstream.UpstreamError(str(e))
+        with response:
+            if response.status_code != 200:
+                raise upstream.UpstreamError(f'{url} returned {response.status_code}')
+            if max_bytes is None:
+                return response.text
+            body = b''
+            for chunk in response.iter_content(8192):
+                body += chunk
+                if len(body) >= max_bytes:
+                    break
+            return body.decode(response.encoding or 'utf-8', errors='replace')
+
+
+def parse_results(html, limit=SEARCH_MAX_RESULTS):
+    """Extract [{'title', 'url'}] from a Google results page."""
+    soup = BeautifulSoup(html, PARSER, parse_only=RESULT_LINKS)
+    results = []
+    for link in soup.find_all('a'):
+        heading = link.find('h3')
+        if heading is None:
+            continue
+        target = parse_qs(urlparse(link['href']).query).get('q')
+        if target and target[0].startswith(('http://', 'https://')):
+            results.append({'title': heading.get_text(), 'url': target[0]})
+            if len(results) >= limit:
+                break
+    return results
+
+
+def fetch_snippet(url):
+    """Return the page's meta description, or None."""
+    html = _get(url, timeout=SEARCH_SNIPPET_TIMEOUT, max_bytes=SEARCH_SNIPPET_MAX_BYTES,
+                service='search_snippet')
+    soup = BeautifulSoup(html, PARSER, parse_only=META_TAGS)
+    for attrs in ({'name': 'description'}, {'property': 'og:description'}):
+        tag = soup.find('meta', attrs=attrs)
+        if tag and tag.get('content'):
+            return ' '.join(tag['content'].split())
+    return None
+
+
+def add_snippets(results, timeout=SEARCH_SNIPPET_TIMEOUT):
+    """Fetch snippets for all results in parallel; slow or failing pages get None."""
+    futures = {_snippet_pool.submit(fetch_snippet, r['url']): r for r in results}
+    done, _ = wait(futures, timeout=timeout)
+    for future, result in futures.items():
+        result['snippet'] = None
+        if future in done and future.exception() is None:
+            result['snippet'] = future.result()
+    return results
+
+
+def search(query, snippets=False):
+    """Return (results, cache status) for query."""
+    normalized = normalize_query(query)
+    params = {'q': normalized, 'snippets': bool(snippets)}
+
+    def load():
+        results = parse_results(_get(SEARCH_BASE_URL, params={'q': normalized}))
+        return add_snippets(results) if snippets else results
+
+    return upstream.cache.get('search', params, load)